@@ -0,0 +1,249 @@
+"""
+Streaming, parallel compilation of very large question CSVs.
+
+ingest_bank() writes the same .qbank file as question_bank.compile_bank, but
+in bounded memory and on every core:
+  1. the CSV is read in blocks of about CHUNK_BYTES that end on a row boundary
+     (a newline outside quotes), and hashed on the way for the bank version;
+  2. worker processes parse, validate and encode the rows of each block into a
+     piece of bank whose offsets and IDs are relative to the block;
+  3. the pieces are appended in order to temporary files for the question
+     table, the option table and the text, which are joined behind the header
+     and moved into place at the end.
+At most two blocks per worker are in flight, so memory stays around
+CHUNK_BYTES times the number of workers, plus, when a previous bank is given,
+an index of its row hashes to keep the question IDs stable.
+
+Row boundaries are found by counting quotes, which assumes that fields
+containing quotes are quoted, as every CSV writer does.
+
+BankManager uses this for CSVs of question_bank.PARALLEL_INGEST_BYTES or more.
+To compile a CSV by hand and list the rows whose options look wrong:
+    python bank_ingest.py aggregated-bank.csv --workers 8
+Like BankManager, this keeps the question IDs of the bank it replaces and keeps
+that bank as <name>.<version>.qbank; --fresh numbers the questions anew.
+"""
+import argparse
+import collections
+import csv
+import io
+import itertools
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from question_bank import (BANK_MAGIC, BANK_VERSION, CSV_ANSWER_COL, CSV_OPTIONS_COL, CSV_QUESTION_COL, HEADER,
+                           OPTION_RECORD, QUESTION_RECORD, QuestionBank, QuestionIds, archive_bank,
+                           bank_path_for, content_hasher, encode_bank, option_problems, parse_fields, row_hash,
+                           write_atomic)
+
+# Bytes of CSV handed to a worker at a time
+CHUNK_BYTES = 4 << 20
+# Worker processes; None uses one per core
+INGEST_WORKERS = None
+# CSV lines listed per kind of problem in a report
+PROBLEM_EXAMPLES = 5
+
+# The question ID of a question record, patched in once the IDs of new and edited rows are known
+ID_FIELD = struct.Struct('<I')
+ID_OFFSET = struct.calcsize('<IIIHh')
+
+# rows: questions in the bank, changed: rows not found in the previous bank (all rows without one),
+# skipped: incomplete rows left out, problems: {problem: (rows, [first CSV lines])}, seconds: time taken
+IngestReport = namedtuple('IngestReport', ['rows', 'changed', 'skipped', 'problems', 'seconds'])
+
+
+def first_row_end(data):
+    """Returns the end of the first CSV row in data (which starts at a row boundary), or 0."""
+    end = data.find(b'\n')
+    while end >= 0 and data.count(b'"', 0, end) % 2:
+        end = data.find(b'\n', end + 1)
+    return end + 1
+
+
+def last_row_end(data):
+    """Returns the end of the last complete CSV row in data (which starts at a row boundary), or 0."""
+    end = data.rfind(b'\n')
+    quotes = data.count(b'"', 0, end) if end >= 0 else 0
+    while end >= 0 and quotes % 2:
+        # Inside a quoted field: step back one line
+        previous = data.rfind(b'\n', 0, end)
+        quotes -= data.count(b'"', previous + 1, end)
+        end = previous
+    return end + 1
+
+
+def row_blocks(f, hasher, chunk_bytes=CHUNK_BYTES):
+    """Yields blocks of whole rows read from a binary CSV file, adding every byte read to hasher."""
+    pending = b''
+    while True:
+        data = f.read(chunk_bytes)
+        if not data:
+            break
+        hasher.update(data)
+        pending += data
+        end = last_row_end(pending)
+        if end:
+            yield pending[:end]
+            pending = pending[end:]
+    if pending:
+        yield pending
+
+
+def csv_columns(header):
+    """Returns the positions of the question, options and answer columns in a CSV header row (bytes)."""
+    fieldnames = next(csv.reader(io.StringIO(header.decode('utf-8-sig'), newline='')), [])
+    # Like csv.DictReader, a repeated column name means its last column
+    positions = {name: i for i, name in enumerate(fieldnames)}
+    return tuple(positions[col] for col in (CSV_QUESTION_COL, CSV_OPTIONS_COL, CSV_ANSWER_COL))
+
+
+def encode_block(data, columns):
+    """
+    Parses, validates and encodes the rows in a block of CSV (bytes). Returns
+    (bank piece, lines in the block, rows skipped, problems): the piece is
+    encode_bank() output with IDs and offsets relative to the block, and
+    problems are (line in the block, problem) pairs.
+    """
+    rows = []
+    skipped = 0
+    problems = []
+    reader = csv.reader(io.StringIO(data.decode('utf-8'), newline=''))
+    line = 1
+    for record in reader:
+        fields = tuple(record[col] if col < len(record) else '' for col in columns)
+        if record and not all(fields):
+            skipped += 1
+        elif record:
+            question, options, answer_index = parse_fields(*fields)
+            problems.extend((line, problem) for problem in option_problems(options, answer_index))
+            rows.append((len(rows), row_hash(fields), question, options, answer_index))
+        line = reader.line_num + 1
+    return encode_bank(rows), data.count(b'\n'), skipped, problems
+
+
+def encoded_blocks(blocks, columns, workers):
+    """Yields encode_block() of every block, in order, encoding up to two blocks per worker at once."""
+    if workers == 1:
+        for block in blocks:
+            yield encode_block(block, columns)
+        return
+    # Spawned, not forked: a fork of a threaded server (Streamlit, the bank watcher) can inherit held locks
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = collections.deque()
+        for block in blocks:
+            pending.append(pool.submit(encode_block, block, columns))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def row_id(ids, position, hash_):
+    """Returns the ID of the row at `position`, or 0 until ids.finish() numbers it (no ids: no previous bank)."""
+    if ids is None:
+        return position
+    match = ids.match(position, hash_)
+    return match[0] if match else 0
+
+
+def ingest_bank(csv_path, bank_path=None, previous=None, workers=INGEST_WORKERS, chunk_bytes=CHUNK_BYTES):
+    """
+    Compiles a question CSV into a .qbank file like question_bank.compile_bank,
+    keeping the question IDs of a `previous` bank of it, with the CSV streamed
+    through `workers` processes (1 encodes in this process). Returns an IngestReport.
+    """
+    started = time.perf_counter()
+    bank_path = bank_path or bank_path_for(csv_path)
+    workers = workers or os.cpu_count() or 1
+    stat = os.stat(csv_path)
+    hasher = content_hasher()
+    ids = QuestionIds(previous) if previous is not None else None
+    rows = options = text = skipped = 0
+    problems = {}
+
+    with open(csv_path, 'rb') as f, \
+            tempfile.TemporaryFile(dir=os.path.dirname(bank_path) or '.') as question_file, \
+            tempfile.TemporaryFile(dir=os.path.dirname(bank_path) or '.') as option_file, \
+            tempfile.TemporaryFile(dir=os.path.dirname(bank_path) or '.') as text_file:
+        blocks = row_blocks(f, hasher, chunk_bytes)
+        first = next(blocks, b'')
+        header_end = first_row_end(first) or len(first)
+        columns = csv_columns(first[:header_end])
+        lines = first.count(b'\n', 0, header_end)
+
+        for piece, block_lines, block_skipped, block_problems in encoded_blocks(
+                itertools.chain([first[header_end:]], blocks), columns, workers):
+            _, _, _, num_questions, num_options, *_ = HEADER.unpack_from(piece)
+            option_base = HEADER.size + num_questions * QUESTION_RECORD.size
+            text_base = option_base + num_options * OPTION_RECORD.size
+            records = bytearray()
+            for text_off, text_len, first_option, count, answer_index, position, hash_ in \
+                    QUESTION_RECORD.iter_unpack(memoryview(piece)[HEADER.size:option_base]):
+                records += QUESTION_RECORD.pack(text_off + text, text_len, first_option + options, count,
+                                                answer_index, row_id(ids, rows + position, hash_), hash_)
+            question_file.write(records)
+            option_file.write(memoryview(piece)[option_base:text_base])
+            text_file.write(memoryview(piece)[text_base:])
+
+            for line, problem in block_problems:
+                count, examples = problems.get(problem, (0, []))
+                if len(examples) < PROBLEM_EXAMPLES:
+                    examples.append(lines + line)
+                problems[problem] = (count + 1, examples)
+            rows += num_questions
+            options += num_options
+            text += len(piece) - text_base
+            skipped += block_skipped
+            lines += block_lines
+
+        for position, question_id in (ids.finish() if ids is not None else {}).items():
+            question_file.seek(position * QUESTION_RECORD.size + ID_OFFSET)
+            question_file.write(ID_FIELD.pack(question_id))
+        for table in (question_file, option_file, text_file):
+            table.seek(0)
+        header = HEADER.pack(BANK_MAGIC, BANK_VERSION, 0, rows, options, stat.st_size, stat.st_mtime_ns,
+                             hasher.digest(), ids.next_id if ids is not None else rows)
+        write_atomic(bank_path, header, question_file, option_file, text_file)
+
+    changed = len(ids.changed) if ids is not None else rows
+    return IngestReport(rows, changed, skipped, problems, time.perf_counter() - started)
+
+
+def describe_problems(report):
+    """Returns one line per kind of problem in an IngestReport, for logs."""
+    lines = []
+    if report.skipped:
+        lines.append(f"{report.skipped} incomplete rows skipped")
+    for problem, (count, examples) in sorted(report.problems.items()):
+        more = ", ..." if count > len(examples) else ""
+        lines.append(f"{count} rows with {problem} (CSV lines {', '.join(map(str, examples))}{more})")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a question CSV into a .qbank file in worker processes.")
+    parser.add_argument('csv_path')
+    parser.add_argument('--bank', help="bank file to write (default: next to the CSV)")
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS, help="worker processes (default: one per core)")
+    parser.add_argument('--chunk-mb', type=float, default=CHUNK_BYTES / (1 << 20), help="MiB of CSV per block")
+    parser.add_argument('--fresh', action='store_true',
+                        help="number the questions from 0 instead of keeping the IDs of the existing bank, "
+                             "which breaks saved quizzes and translations of it")
+    args = parser.parse_args()
+
+    bank_path = args.bank or bank_path_for(args.csv_path)
+    previous = QuestionBank(bank_path) if os.path.exists(bank_path) else None
+    if previous is not None:
+        # Quizzes drawn from the existing bank resume from this copy
+        archive_bank(bank_path, previous.version)
+    report = ingest_bank(args.csv_path, bank_path, None if args.fresh else previous, workers=args.workers,
+                         chunk_bytes=int(args.chunk_mb * (1 << 20)))
+    print(f"{args.csv_path} -> {bank_path} ({report.rows} questions, {report.changed} new or changed, "
+          f"in {report.seconds:.2f}s)")
+    for line in describe_problems(report):
+        print(line)
@@ -0,0 +1,339 @@
+"""
+Micro-benchmarks for the quiz's hot paths, compared against a stored baseline.
+
+Cases, timed per call (best of --repeat rounds, like timeit):
+  load_cli      quiz_app.load_questions: decode the whole (already mapped) bank
+  load_web      quiz_webapp.load_questions: the questions shared by all sessions
+  compile       question_bank.compile_bank: parse the CSV and write the bank
+  ingest        bank_ingest.ingest_bank: the same, in chunks on one worker process per core
+  recompile     question_bank.build_bank after one row of the CSV was edited,
+                reusing the previous bank (what BankManager does on a change)
+  sample        draw the questions of a --quiz-size quiz (quiz_questions)
+  rebuild       the reconstruction in translate_questions_smart (question_texts
+                and rebuild_questions) for that quiz, translation itself excluded
+  build_doc     build_state_document for a finished quiz
+  doc_bytes     size of that document as JSON, bytes values at their length (bytes, not time)
+  save_full     save_state writing the whole document (SQLite backend)
+  save_incr     save_state with incremental=True after one more answer
+  report        generate_report_content for the finished quiz
+  grade         get_grade_message for every score from 0 to 100
+
+Every case runs on each shipped subject CSV and on synthetic banks of --sizes
+questions. Functions of quiz_webapp.py are taken from the script itself (its
+imports, constants and function definitions), so the Streamlit UI never runs.
+
+Results are compared with benchmarks/baselines/hotpaths.json when it exists;
+ratios above --threshold are marked as regressions. Baselines only mean
+something on the machine that recorded them, so none is kept in the
+repository: record one with --save-baseline before changing code.
+
+Usage (from the repository root):
+    python benchmarks/bench_hotpaths.py --save-baseline   # record the baseline
+    python benchmarks/bench_hotpaths.py                   # compare with it
+    python benchmarks/bench_hotpaths.py --sizes 10000 --fail-on-regression
+"""
+import argparse
+import ast
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baselines', 'hotpaths.json')
+CASES = ['load_cli', 'load_web', 'compile', 'ingest', 'recompile', 'sample', 'rebuild', 'build_doc', 'doc_bytes',
+         'save_full', 'save_incr', 'report', 'grade']
+# Cases that are measured in bytes rather than seconds
+SIZE_CASES = {'doc_bytes'}
+
+WORDS = ("rantai pasok pelanggan permintaan strategi pemasaran produk harga distribusi "
+         "persediaan pemasok logistik biaya nilai pasar segmen keberlanjutan lingkungan "
+         "sosial manajemen kinerja risiko informasi proses gudang transportasi").split()
+
+
+class SessionState(dict):
+    """Plain stand-in for st.session_state: a dict that also allows attribute access."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+def load_app_functions(script):
+    """
+    Runs the imports, constants (upper-case names) and function definitions of
+    a Streamlit script and returns the resulting namespace.
+    """
+    with open(script, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    body = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef)):
+            body.append(node)
+        elif (isinstance(node, ast.Assign) and
+              all(isinstance(t, ast.Name) and t.id[0].isupper() for t in node.targets)):
+            body.append(node)
+    namespace = {'__name__': '__bench__', '__file__': script}
+    exec(compile(ast.Module(body=body, type_ignores=[]), script, 'exec'), namespace)
+    return namespace
+
+
+def write_synthetic_csv(path, num_questions, seed=0):
+    """Writes a question CSV like the shipped ones, with num_questions random questions."""
+    from question_bank import CSV_ANSWER_COL, CSV_OPTIONS_COL, CSV_QUESTION_COL
+
+    rng = random.Random(seed)
+
+    def sentence(num_words):
+        return ' '.join(rng.choice(WORDS) for _ in range(num_words)).capitalize()
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([CSV_QUESTION_COL, CSV_OPTIONS_COL, CSV_ANSWER_COL])
+        for i in range(num_questions):
+            letters = 'abcde'[:rng.choice((4, 5))]
+            options = '\n'.join(f"{letter}. {sentence(rng.randint(4, 12))}." for letter in letters)
+            writer.writerow([f"{sentence(rng.randint(8, 20))}? ({i})", options, rng.choice(letters)])
+
+
+def write_edited_csv(src, dst):
+    """Copies a question CSV, editing the text of its middle question."""
+    from question_bank import CSV_QUESTION_COL
+
+    with open(src, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+    rows[len(rows) // 2][CSV_QUESTION_COL] += " (edited)"
+    with open(dst, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def serialized_size(document):
+    """Length of a document as compact JSON, counting bytes values (snapshots) at their raw length."""
+    blobs = []
+
+    def default(value):
+        if isinstance(value, bytes):
+            blobs.append(len(value))
+            return ''
+        raise TypeError(type(value).__name__)
+
+    text = json.dumps(document, ensure_ascii=False, separators=(',', ':'), default=default)
+    return len(text.encode('utf-8')) + sum(size - 2 for size in blobs)
+
+
+def measure(fn, repeat):
+    """Best time per call of fn over `repeat` rounds of at least 0.2 seconds each."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def finished_session(quiz, rng):
+    """Session state of a quiz whose questions have all been answered, with the timer on."""
+    app = APP
+    history = []
+    for q in quiz:
+        chosen = rng.randrange(len(q['options']))
+        history.append(app['AnswerRecord'](q['id'], chosen, chosen == q['answer_index'],
+                                           rng.randint(0, 3_600_000)))
+    return SessionState(
+        session_id='BENCH1', selected_subject='benchmark', user_name='bench',
+        quiz_draw=app['QuizDraw'](1, len(quiz), len(quiz), True, False),
+        questions=quiz, original_questions=quiz, answer_history=history,
+        current_question_index=len(quiz) - 1, score=sum(r.correct for r in history),
+        auto_next=False, answer_submitted=True, last_choice=history[-1].chosen_index, scored=True,
+        timer_enabled=True, show_timer=True, start_time=time.time(), time_elapsed_before_pause=0.0,
+        final_time_taken=1234.5, language='id', previous_language='id',
+    )
+
+
+def bench_dataset(csv_path, args, workdir):
+    """Returns {case: value} for one question CSV."""
+    import quiz_app
+    from bank_ingest import ingest_bank
+    from question_bank import QuestionBank, build_bank, compile_bank
+    from translation import question_texts, rebuild_questions
+
+    app = APP
+    rng = random.Random(args.seed)
+    results = {}
+
+    questions = quiz_app.load_questions(csv_path)
+    results['load_cli'] = measure(lambda: quiz_app.load_questions(csv_path), args.repeat)
+    shared = app['load_questions'](csv_path)
+    results['load_web'] = measure(lambda: app['load_questions'](csv_path), args.repeat)
+    bank_path = os.path.join(workdir, 'compiled.qbank')
+    results['compile'] = measure(lambda: compile_bank(csv_path, bank_path), args.repeat)
+    ingest_path = os.path.join(workdir, 'ingested.qbank')
+    results['ingest'] = measure(lambda: ingest_bank(csv_path, ingest_path), args.repeat)
+    previous = QuestionBank(bank_path)
+    edited_path = os.path.join(workdir, 'edited.csv')
+    write_edited_csv(csv_path, edited_path)
+    results['recompile'] = measure(lambda: build_bank(edited_path, previous), args.repeat)
+    previous.close()
+
+    k = min(args.quiz_size, len(questions))
+
+    def draw_quiz(seed):
+        draw = app['QuizDraw'](seed, k, len(shared), True, False)
+        return app['quiz_questions'](csv_path, draw)
+
+    results['sample'] = measure(lambda: draw_quiz(rng.getrandbits(32)), args.repeat)
+    quiz = draw_quiz(args.seed)
+
+    translated = [f"[en] {text}" for text in question_texts(quiz)]
+
+    def rebuild():
+        question_texts(quiz)
+        return rebuild_questions(quiz, translated)
+
+    results['rebuild'] = measure(rebuild, args.repeat)
+
+    state = finished_session(quiz, rng)
+    results['build_doc'] = measure(lambda: app['build_state_document'](state), args.repeat)
+    results['doc_bytes'] = serialized_size(app['build_state_document'](state))
+    results['save_full'] = measure(lambda: app['save_state']('BENCH1', state), args.repeat)
+    app['save_state']('BENCH1', state, incremental=True)
+
+    def save_one_more_answer():
+        state.autosave_history_len = len(state.answer_history) - 1
+        app['save_state']('BENCH1', state, incremental=True)
+
+    results['save_incr'] = measure(save_one_more_answer, args.repeat)
+    results['report'] = measure(lambda: app['generate_report_content'](state), args.repeat)
+    results['grade'] = measure(lambda: [app['get_grade_message'](score) for score in range(101)],
+                               args.repeat)
+    return results, len(questions)
+
+
+def run(args, workdir):
+    from question_bank import SUBJECT_FILES
+
+    datasets = [(name, os.path.join(REPO_ROOT, path)) for name, path in SUBJECT_FILES.items()]
+    for size in args.sizes:
+        path = os.path.join(workdir, f'synthetic-{size}.csv')
+        write_synthetic_csv(path, size, args.seed)
+        datasets.append((f"synthetic {size}", path))
+
+    results = {}
+    for name, path in datasets:
+        started = time.perf_counter()
+        results[name], num_questions = bench_dataset(path, args, workdir)
+        print(f"  {name}: {num_questions} questions ({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+    return results
+
+
+def format_value(case, value):
+    if value is None:
+        return '-'
+    if case in SIZE_CASES:
+        return f"{value / 1024:.1f}KiB"
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if value >= scale:
+            return f"{value / scale:.2f}{unit}"
+    return f"{value / 1e-9:.0f}ns"
+
+
+def print_results(results, baseline, threshold):
+    """Prints one table per case; returns the (dataset, case, ratio) of every regression."""
+    regressions = []
+    for case in CASES:
+        print(f"\n{case}")
+        print(f"  {'dataset':<44} {'current':>10} {'baseline':>10} {'ratio':>7}")
+        for dataset, values in results.items():
+            current = values.get(case)
+            before = baseline.get(dataset, {}).get(case)
+            line = f"  {dataset:<44} {format_value(case, current):>10} {format_value(case, before):>10}"
+            if current is not None and before:
+                ratio = current / before
+                mark = ''
+                if ratio > threshold:
+                    mark = '  slower'
+                    regressions.append((dataset, case, ratio))
+                elif ratio < 1 / threshold:
+                    mark = '  faster'
+                line += f" {ratio:>6.2f}x{mark}"
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='*', default=[10_000, 50_000, 100_000],
+                        help="question counts of the synthetic banks")
+    parser.add_argument('--quiz-size', type=int, default=50, help="questions per quiz for the per-quiz cases")
+    parser.add_argument('--repeat', type=int, default=5, help="timing rounds per case (best is kept)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help="current/baseline ratio above which a case counts as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true', help="exit with status 1 on regressions")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='quiz-hotpaths-')
+    # Must be set before the app's modules are imported
+    os.environ['QUIZ_TRANSLATION_CACHE'] = os.path.join(workdir, 'translations.sqlite3')
+    os.environ['QUIZ_STORAGE_BACKEND'] = 'sqlite'
+    os.environ['QUIZ_SQLITE_PATH'] = os.path.join(workdir, 'quiz_data.sqlite3')
+    os.chdir(REPO_ROOT)
+
+    # Cached functions warn on every call when there is no Streamlit runtime. Reading
+    # an option first, because parsing the config resets the log level.
+    from streamlit import config, logger
+    config.get_option('logger.level')
+    logger.set_log_level('error')
+    global APP
+    APP = load_app_functions(os.path.join(REPO_ROOT, 'quiz_webapp.py'))
+
+    try:
+        results = run(args, workdir)
+    finally:
+        APP['get_storage']().close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            stored = json.load(f)
+        baseline = stored['results']
+        print(f"baseline: {args.baseline} ({stored['recorded']}, Python {stored['python']}, {stored['machine']})")
+    regressions = print_results(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'recorded': time.strftime('%Y-%m-%d'), 'python': platform.python_version(),
+                       'machine': platform.machine(), 'quiz_size': args.quiz_size, 'results': results},
+                      f, indent=1, ensure_ascii=False)
+        print(f"\nbaseline saved to {args.baseline}")
+    elif not baseline:
+        print(f"\nno baseline at {args.baseline}; record one with --save-baseline")
+    elif regressions:
+        print(f"\n{len(regressions)} case(s) slower than {args.threshold}x the baseline")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+APP = None
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: size and encode/decode time of saved session documents.
+
+Builds realistic sessions (every question of a quiz answered, timer on, a
+translated language, a user name) for several quiz lengths and compares
+  plain     the document as nested fields (session format 4)
+  snapshot  the document as one compressed snapshot (format 5, session_codec.py)
+Sizes follow Firestore's storage size rules, which is what its 1 MiB document
+limit applies to. Times are per document: encode includes building it from the
+session state, decode is decode_snapshot(). "delta" is the size of one
+incremental autosave, which is sent as plain fields in both formats.
+
+Usage (from the repository root):
+    python benchmarks/bench_session_codec.py --lengths 10 50 195 1000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def firestore_size(value):
+    """Storage size of a Firestore value, per https://firebase.google.com/docs/firestore/storage-size."""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(firestore_size(name) + firestore_size(v) for name, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(firestore_size(v) for v in value)
+    raise TypeError(type(value).__name__)
+
+
+def document_size(collection, doc_id, document):
+    """Storage size of a whole document: its name, its fields and 32 bytes of overhead."""
+    return firestore_size(collection) + firestore_size(doc_id) + 16 + firestore_size(document) + 32
+
+
+def realistic_session(app, questions, length, rng):
+    from bench_hotpaths import SessionState
+
+    ids = rng.sample(range(len(questions)), length)
+    history = []
+    for question_id in ids:
+        q = questions[question_id]
+        chosen = rng.randrange(len(q['options']))
+        history.append(app['AnswerRecord'](question_id, chosen, chosen == q['answer_index'],
+                                           rng.randint(5_000, 3_600_000)))
+    return SessionState(
+        session_id='BUDISANTOSO-48213', selected_subject="Pemasaran Strategik (Pastra)",
+        user_name='Budi Santoso', quiz_draw=app['QuizDraw'](rng.getrandbits(32), length, len(questions), True, False),
+        answer_history=history, current_question_index=length - 1,
+        score=sum(r.correct for r in history), auto_next=False, answer_submitted=True,
+        last_choice=history[-1].chosen_index, scored=True, timer_enabled=True, show_timer=True,
+        time_elapsed_before_pause=rng.uniform(60, 3600), language='en', previous_language='id',
+        save_revision=length,
+    )
+
+
+def measure(fn, repeat=5):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lengths', type=int, nargs='*', default=[10, 50, 100, 195, 1000],
+                        help="answered questions per session")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    os.chdir(REPO_ROOT)
+    from streamlit import config, logger
+    config.get_option('logger.level')
+    logger.set_log_level('error')
+    from bench_hotpaths import load_app_functions
+    from question_bank import SUBJECT_FILES, open_bank
+    from session_codec import decode_snapshot
+
+    app = load_app_functions(os.path.join(REPO_ROOT, 'quiz_webapp.py'))
+    questions = list(open_bank(SUBJECT_FILES["Pemasaran Strategik (Pastra)"]))
+    rng = random.Random(args.seed)
+
+    print(f"{'answers':>8} {'plain':>10} {'snapshot':>10} {'ratio':>6} {'encode':>10} {'decode':>10} {'delta':>7}")
+    for length in args.lengths:
+        # Sessions longer than the bank repeat questions, like several attempts would
+        state = realistic_session(app, questions * (length // len(questions) + 1), length, rng)
+        plain = {'format': 4, **app['build_state_snapshot'](state)}
+        document = app['build_state_document'](state)
+        delta = {key: state[key] for key in app['DELTA_STATE_KEYS']}
+        delta[f"history.q{length - 1}"] = state.answer_history[-1]
+
+        plain_size = document_size('quiz_sessions', state.session_id, plain)
+        snapshot_size = document_size('quiz_sessions', state.session_id, document)
+        encode = measure(lambda: app['build_state_document'](state))
+        decode = measure(lambda: decode_snapshot(document['snapshot']))
+        print(f"{length:>8} {plain_size:>9}B {snapshot_size:>9}B {plain_size / snapshot_size:>5.1f}x "
+              f"{encode * 1e6:>8.0f}us {decode * 1e6:>8.0f}us {firestore_size(delta):>6}B")
+
+
+if __name__ == "__main__":
+    main()
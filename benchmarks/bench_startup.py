@@ -0,0 +1,153 @@
+"""
+Benchmark: cold start of quiz_webapp.py on a fresh worker.
+
+Each measurement runs in a new Python process, so nothing is cached:
+  imports       time to run the app's top-level import statements
+                (after Streamlit itself is loaded, which every app pays for)
+  first render  time of the first script run, i.e. until the subject
+                selection screen has been rendered
+It also lists which heavy client libraries were loaded by then.
+
+Firestore is given a throwaway service account, so the real client is created
+(offline; nothing is sent until the first request) and browser local storage
+is replaced with the stand-in.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py                    # current quiz_webapp.py
+    python benchmarks/bench_startup.py --compare a15dbe1  # also a git revision
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Libraries the subject selection screen should not need
+HEAVY_MODULES = ['google.cloud.firestore', 'googletrans', 'pandas', 'nest_asyncio']
+
+
+def make_service_account():
+    """Returns service account info with a freshly generated key for a project that doesn't exist."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    return {
+        "type": "service_account",
+        "project_id": "quiz-bench",
+        "private_key_id": "0",
+        "private_key": pem,
+        "client_email": "bench@quiz-bench.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+
+
+def top_level_imports(script):
+    """Returns the module-level import statements of a script as a code object."""
+    with open(script, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return compile(ast.Module(body=imports, type_ignores=[]), script, 'exec')
+
+
+def child_imports(script):
+    import streamlit  # noqa: F401
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    code = top_level_imports(script)
+    started = time.perf_counter()
+    exec(code, {'__name__': '__bench__'})
+    return {'imports': time.perf_counter() - started}
+
+
+def child_first_render(script, secrets_path):
+    sys.path.insert(0, BENCH_DIR)
+    import stand_ins
+    from streamlit.testing.v1 import AppTest
+
+    stand_ins.install_local_storage()
+    with open(secrets_path, encoding='utf-8') as f:
+        service_account = json.load(f)
+    at = AppTest.from_file(script, default_timeout=60)
+    at.secrets['firestore'] = service_account
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return {'first_render': elapsed, 'loaded': [m for m in HEAVY_MODULES if m in sys.modules]}
+
+
+def run_child(*args):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), *args], cwd=REPO_ROOT,
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def bench_script(script, secrets_path, runs):
+    imports, renders, loaded = [], [], []
+    for _ in range(runs):
+        imports.append(run_child('--child-imports', script)['imports'])
+        result = run_child('--child-render', script, '--secrets', secrets_path)
+        renders.append(result['first_render'])
+        loaded = result['loaded']
+    return statistics.median(imports), statistics.median(renders), loaded
+
+
+def checkout(rev):
+    """Writes quiz_webapp.py at a git revision next to the original and returns its path."""
+    source = subprocess.run(['git', 'show', f'{rev}:quiz_webapp.py'], cwd=REPO_ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    path = os.path.join(REPO_ROOT, f'_bench_{rev}.py')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes per measurement (median is shown)")
+    parser.add_argument('--compare', metavar='REV', help="also benchmark quiz_webapp.py at this git revision")
+    parser.add_argument('--child-imports', metavar='SCRIPT', help=argparse.SUPPRESS)
+    parser.add_argument('--child-render', metavar='SCRIPT', help=argparse.SUPPRESS)
+    parser.add_argument('--secrets', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_imports:
+        print(json.dumps(child_imports(args.child_imports)))
+        return
+    if args.child_render:
+        print(json.dumps(child_first_render(args.child_render, args.secrets)))
+        return
+
+    secrets_path = os.path.join(REPO_ROOT, '_bench_service_account.json')
+    with open(secrets_path, 'w', encoding='utf-8') as f:
+        json.dump(make_service_account(), f)
+
+    scripts = []
+    if args.compare:
+        scripts.append((f"quiz_webapp.py @ {args.compare}", checkout(args.compare)))
+    scripts.append(("quiz_webapp.py (working tree)", os.path.join(REPO_ROOT, 'quiz_webapp.py')))
+
+    try:
+        print(f"{'script':<34} {'imports':>10} {'first render':>14}  heavy modules loaded")
+        for name, script in scripts:
+            imports, render, loaded = bench_script(script, secrets_path, args.runs)
+            print(f"{name:<34} {imports * 1000:>8.0f}ms {render * 1000:>12.0f}ms  {', '.join(loaded) or '-'}")
+    finally:
+        os.remove(secrets_path)
+        for name, script in scripts:
+            if os.path.basename(script).startswith('_bench_'):
+                os.remove(script)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark: script reruns and Firestore writes caused by the on-screen timer.
+
+Drives one simulated student through a timed quiz with Streamlit's AppTest and
+measures two idle phases of --seconds each:
+  thinking  the question is on screen and no answer has been submitted yet
+  answered  an answer was submitted and the student has not clicked Next yet
+Any rerun or write in these phases is caused by the app itself, not the student.
+
+Usage (from the repository root):
+    python benchmarks/bench_timer.py                    # current quiz_webapp.py
+    python benchmarks/bench_timer.py --compare a15dbe1  # also a git revision
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stand_ins  # noqa: E402
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+SUBJECT = "MRPL Study Case"
+
+# Every script run renders the title exactly once, so wrapping it counts reruns
+script_runs = [0]
+_title = st.title
+
+
+def _counting_title(*args, **kwargs):
+    script_runs[0] += 1
+    return _title(*args, **kwargs)
+
+
+st.title = _counting_title
+
+
+def click(app_test, label, timeout):
+    next(b for b in app_test.button if b.label == label).click().run(timeout=timeout)
+
+
+def start_timed_quiz(script):
+    """Returns an AppTest sitting on the first question of a timed quiz (timer hidden)."""
+    at = AppTest.from_file(script, default_timeout=30)
+    at.secrets['firestore'] = {}
+    at.run()
+    at.radio[0].set_value(SUBJECT)
+    click(at, "Select Subject", 30)
+    next(t for t in at.toggle if t.label == "Enable Timer?").set_value(True)
+    click(at, "Start Quiz", 30)
+    return at
+
+
+def document_writes():
+    """Document writes so far, whether sent one by one or in batches."""
+    return stand_ins.CALLS['set'] + stand_ins.CALLS['update'] + stand_ins.CALLS['batched_writes']
+
+
+def measure(action, seconds):
+    """Runs `action` for a window of `seconds` and returns (reruns, writes) it caused."""
+    runs_before = script_runs[0]
+    writes_before = document_writes()
+    started = time.time()
+    try:
+        action(seconds)
+    except RuntimeError:
+        # AppTest gives up once the script keeps rerunning past the timeout
+        pass
+    # An idle browser sends nothing, so the rest of the window adds no work
+    time.sleep(max(0.0, seconds - (time.time() - started)))
+    return script_runs[0] - runs_before, document_writes() - writes_before
+
+
+def bench_script(script, seconds):
+    results = {}
+
+    # Thinking: show the timer and let the page sit on the question
+    at = start_timed_quiz(script)
+    at.session_state['show_timer'] = True
+    results['thinking'] = measure(lambda s: at.run(timeout=s), seconds)
+
+    # Answered: submit an answer with the timer shown, then wait before clicking Next
+    at = start_timed_quiz(script)
+    at.session_state['show_timer'] = True
+    at.session_state['session_id'] = 'BENCH-00000'
+    at.radio[-1].set_value(at.radio[-1].options[0])
+    results['answered'] = measure(lambda s: click(at, "Submit Answer", s), seconds)
+    return results
+
+
+def checkout(rev):
+    """Writes quiz_webapp.py at a git revision next to the original and returns its path."""
+    source = subprocess.run(['git', 'show', f'{rev}:quiz_webapp.py'], cwd=REPO_ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    path = os.path.join(REPO_ROOT, f'_bench_{rev}.py')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    return path
+
+
+def report(name, results, seconds):
+    print(f"\n{name}")
+    print(f"  {'phase':<10} {'reruns/sec':>12} {'writes/student-minute':>24}")
+    for phase, (runs, writes) in results.items():
+        print(f"  {phase:<10} {runs / seconds:>12.2f} {writes * 60 / seconds:>24.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10.0, help="length of each idle phase")
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="simulated Firestore latency per call")
+    parser.add_argument('--compare', metavar='REV', help="also benchmark quiz_webapp.py at this git revision")
+    args = parser.parse_args()
+
+    os.chdir(REPO_ROOT)
+    stand_ins.install(latency=args.latency_ms / 1000)
+
+    scripts = []
+    if args.compare:
+        scripts.append((f"quiz_webapp.py @ {args.compare}", checkout(args.compare)))
+    scripts.append(("quiz_webapp.py (working tree)", os.path.join(REPO_ROOT, 'quiz_webapp.py')))
+
+    try:
+        for name, script in scripts:
+            report(name, bench_script(script, args.seconds), args.seconds)
+    finally:
+        for name, script in scripts:
+            if os.path.basename(script).startswith('_bench_'):
+                os.remove(script)
+
+
+if __name__ == "__main__":
+    main()
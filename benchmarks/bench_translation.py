@@ -0,0 +1,88 @@
+"""
+Benchmark: translation scheduler throughput and latency per concurrency limit.
+
+Translates every question and option of a subject through TranslationScheduler
+against a simulated Google Translate endpoint that answers after a random
+latency and starts rejecting calls (like HTTP 429) once more than
+--server-limit calls are open at the same time. Use the table to pick
+TRANSLATION_CONCURRENCY in quiz_webapp.py.
+
+The "unbounded" row mimics the old behaviour: every text at once, no retries.
+
+Usage (from the repository root):
+    python benchmarks/bench_translation.py --subject "MRPL PPT Only"
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from question_bank import SUBJECT_FILES, open_bank  # noqa: E402
+from translation import TranslationScheduler  # noqa: E402
+
+
+class SimulatedTranslateEndpoint:
+    """Async translate callable with lognormal latency and concurrency-based throttling."""
+
+    def __init__(self, latency_ms, server_limit):
+        self.latency = latency_ms / 1000
+        self.server_limit = server_limit
+        self.open_calls = 0
+
+    async def __call__(self, text, src_lang, dest_lang):
+        self.open_calls += 1
+        try:
+            await asyncio.sleep(random.lognormvariate(0, 0.5) * self.latency)
+            if self.open_calls > self.server_limit:
+                raise RuntimeError("429 Too Many Requests")
+            return f"[{dest_lang}] {text}"
+        finally:
+            self.open_calls -= 1
+
+
+def run(texts, concurrency, retries, args):
+    scheduler = TranslationScheduler(SimulatedTranslateEndpoint(args.latency_ms, args.server_limit),
+                                     max_concurrency=concurrency, max_retries=retries,
+                                     backoff=args.backoff)
+    started = time.perf_counter()
+    asyncio.run(scheduler.translate_many(texts, 'id', 'en'))
+    wall = time.perf_counter() - started
+    return wall, scheduler.stats.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subject', default="MRPL PPT Only", choices=list(SUBJECT_FILES))
+    parser.add_argument('--latency-ms', type=float, default=150.0, help="median simulated call latency")
+    parser.add_argument('--server-limit', type=int, default=16, help="open calls before throttling starts")
+    parser.add_argument('--backoff', type=float, default=0.25, help="first retry delay in seconds")
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    os.chdir(REPO_ROOT)
+    random.seed(0)
+    texts = []
+    for q in open_bank(SUBJECT_FILES[args.subject]):
+        texts.append(q['question'])
+        texts.extend(q['options'])
+    print(f"{args.subject}: {len(texts)} texts, {len(set(texts))} unique; "
+          f"simulated latency {args.latency_ms:.0f} ms, throttling above {args.server_limit} open calls\n")
+
+    print(f"{'concurrency':>11} {'wall s':>8} {'texts/s':>8} {'p50 ms':>7} {'p95 ms':>7} "
+          f"{'calls':>6} {'failed':>7} {'gave up':>8}")
+    rows = [(str(c), c, args.retries) for c in args.concurrency]
+    rows.append(("unbounded", len(texts), 0))
+    for label, concurrency, retries in rows:
+        wall, s = run(texts, concurrency, retries, args)
+        print(f"{label:>11} {wall:>8.2f} {s['translated'] / wall:>8.1f} {s['p50_ms']:>7.0f} {s['p95_ms']:>7.0f} "
+              f"{s['calls']:>6} {s['failures']:>7} {s['gave_up']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Load test: many simulated students using quiz_webapp.py at the same time.
+
+Each student is a separate Streamlit session driven with AppTest. It picks a
+subject, starts a quiz, answers every question (switching language halfway
+through), saves its progress with a code and finally resumes from that code in
+a new session. Up to --concurrency students are in the middle of a quiz at
+any time, all in this process like sessions on one server: their actions are
+interleaved round-robin while the app's background threads (translation,
+write-behind) keep running. AppTest cannot run scripts in parallel threads, so
+script runs themselves are serialised, as they mostly are under the GIL anyway;
+run several copies to load several cores.
+
+Storage is the in-memory Firestore stand-in (--backend firestore) or a
+throwaway SQLite database (--backend sqlite); Google Translate and browser
+local storage are always stand-ins. Reported:
+  interaction latency   p50/p99 per student action (one action may rerun the
+                        script more than once)
+  reruns/sec            script runs per second across all sessions
+  memory per session    size of each session's state, and process RSS growth
+  calls per answer      storage and translation calls per answered question
+
+Usage (from the repository root):
+    python benchmarks/load_test.py --sessions 200 --concurrency 200
+    python benchmarks/load_test.py --backend sqlite --questions 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+SUBJECTS = ["MRPL Study Case", "MRPL PPT Only", "Pemasaran Strategik (Pastra)"]
+LANGUAGES = ["en", "ja", "de"]
+
+# Storage operations counted as backend calls
+STORAGE_OPS = ['get', 'set', 'create', 'update', 'commit', 'add']
+
+
+class Recorder:
+    """Latency samples per action, plus script run, answer and failure counts."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.script_runs = 0
+        self.answers = 0
+        self.failures = []
+
+    def add(self, action, seconds):
+        self.latencies[action].append(seconds)
+
+
+recorder = Recorder()
+
+
+def count_script_runs():
+    """Every script run renders the title exactly once, so wrapping it counts reruns."""
+    import streamlit as st
+
+    title = st.title
+
+    def counting_title(*args, **kwargs):
+        recorder.script_runs += 1
+        return title(*args, **kwargs)
+
+    st.title = counting_title
+
+
+def count_sqlite_calls():
+    """Counts SQLiteBackend calls in stand_ins.CALLS, like the Firestore stand-in does."""
+    import stand_ins
+    from storage import SQLiteBackend
+
+    def counted(name, method):
+        def wrapper(self, *args, **kwargs):
+            stand_ins.CALLS[name] += 1
+            return method(self, *args, **kwargs)
+        return wrapper
+
+    for name in ('get', 'set', 'create', 'update', 'add'):
+        setattr(SQLiteBackend, name, counted(name, getattr(SQLiteBackend, name)))
+
+
+def deep_size(obj, seen=None):
+    """Approximate memory held by plain data (containers, strings, numbers) reachable from obj."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def rss_bytes():
+    """Resident set size of this process (Linux), or 0 where unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def new_session(script):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(script, default_timeout=120)
+    at.secrets['firestore'] = {}
+    return at
+
+
+def timed(action, fn):
+    started = time.perf_counter()
+    result = fn()
+    recorder.add(action, time.perf_counter() - started)
+    return result
+
+
+def click(at, label):
+    next(b for b in at.button if b.label == label).click().run()
+
+
+def simulate_student(script, num_questions, seed, sessions):
+    """
+    One student's whole visit as a generator that yields after each action.
+    Appends its AppTest sessions to `sessions` (to keep them alive like a
+    server does) and returns the session state size in bytes at the end of the quiz.
+    """
+    rng = random.Random(seed)
+    at = new_session(script)
+    sessions.append(at)
+    timed('open', at.run)
+    yield
+    at.radio[0].set_value(rng.choice(SUBJECTS))
+    timed('select subject', lambda: click(at, "Select Subject"))
+    yield
+    at.number_input[0].set_value(num_questions)
+    timed('start quiz', lambda: click(at, "Start Quiz"))
+    yield
+
+    switch_at = num_questions // 2
+    save_code = None
+    for i in range(num_questions):
+        if i == switch_at:
+            timed('switch language', lambda: at.selectbox[0].set_value(rng.choice(LANGUAGES)).run())
+            yield
+        answers = at.radio[-1]
+        answers.set_value(rng.randrange(len(answers.options)))
+        timed('submit answer', lambda: click(at, "Submit Answer"))
+        recorder.answers += 1
+        yield
+        if i == switch_at:
+            timed('save progress', lambda: click(at, "Save Progress"))
+            save_code = next(m.value for m in at.sidebar.success if '**' in m.value).split('**')[1]
+            yield
+        timed('next question', lambda: click(at, "Next Question"))
+        yield
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    state_size = deep_size(dict(at.session_state.to_dict()))
+
+    # Come back later in a new browser session and resume from the save code
+    resumed = new_session(script)
+    sessions.append(resumed)
+    timed('open', resumed.run)
+    yield
+    resumed.text_input[1].set_value(save_code)
+    timed('resume', lambda: click(resumed, "Load Quiz"))
+    if resumed.session_state.get('current_question_index') != switch_at:
+        raise RuntimeError(f"resumed at question {resumed.session_state.get('current_question_index')}, "
+                           f"expected {switch_at}")
+    return state_size
+
+
+def run_students(script, args):
+    """Interleaves the students' actions, keeping up to args.concurrency of them active."""
+    sessions = []
+    state_sizes = []
+    waiting = deque(range(args.sessions))
+    active = deque()
+    while waiting or active:
+        while waiting and len(active) < args.concurrency:
+            student = waiting.popleft()
+            active.append((student, simulate_student(script, args.questions, args.seed + student, sessions)))
+        student, steps = active.popleft()
+        try:
+            next(steps)
+        except StopIteration as done:
+            state_sizes.append(done.value)
+        except Exception as e:
+            recorder.failures.append((student, repr(e)))
+        else:
+            active.append((student, steps))
+    return state_sizes, sessions
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+
+def report(args, wall, state_sizes, rss_growth):
+    import stand_ins
+
+    print(f"\n{args.sessions} students x {args.questions} questions, concurrency {args.concurrency}, "
+          f"{args.backend} backend ({args.latency_ms:.0f} ms/call), translation {args.translate_ms:.0f} ms/call")
+    print(f"wall time {wall:.1f}s, {recorder.answers} answers, {len(recorder.failures)} failed students")
+    for student, error in recorder.failures[:5]:
+        print(f"  student {student}: {error}")
+
+    print(f"\n  {'action':<18} {'count':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    all_samples = []
+    for action, samples in recorder.latencies.items():
+        all_samples.extend(samples)
+        print(f"  {action:<18} {len(samples):>7} {percentile(samples, 0.5) * 1000:>9.1f} "
+              f"{percentile(samples, 0.99) * 1000:>9.1f}")
+    print(f"  {'all':<18} {len(all_samples):>7} {percentile(all_samples, 0.5) * 1000:>9.1f} "
+          f"{percentile(all_samples, 0.99) * 1000:>9.1f}")
+
+    answers = max(recorder.answers, 1)
+    storage_calls = sum(stand_ins.CALLS[op] for op in STORAGE_OPS)
+    print(f"\nreruns/sec            {recorder.script_runs / wall:.1f} ({recorder.script_runs} script runs)")
+    if state_sizes:
+        print(f"session state         {statistics.mean(state_sizes) / 1024:.1f} KiB mean, "
+              f"{max(state_sizes) / 1024:.1f} KiB max")
+    print(f"RSS growth            {rss_growth / args.sessions / 1024:.0f} KiB per student "
+          f"({rss_growth / 2 ** 20:.0f} MiB total)")
+    print(f"storage calls/answer  {storage_calls / answers:.2f} "
+          f"({', '.join(f'{op} {stand_ins.CALLS[op]}' for op in STORAGE_OPS if stand_ins.CALLS[op])})")
+    if stand_ins.CALLS['batched_writes']:
+        print(f"  documents written in batches: {stand_ins.CALLS['batched_writes']}")
+    print(f"translations/answer   {stand_ins.CALLS['translate'] / answers:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=50, help="number of simulated students")
+    parser.add_argument('--concurrency', type=int, default=50, help="students in the middle of a quiz at once")
+    parser.add_argument('--questions', type=int, default=10, help="questions per quiz")
+    parser.add_argument('--backend', choices=['firestore', 'sqlite'], default='firestore')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="Firestore stand-in latency per call")
+    parser.add_argument('--translate-ms', type=float, default=50.0, help="translation stand-in latency per call")
+    parser.add_argument('--settle', type=float, default=3.0,
+                        help="seconds to wait at the end for background writes to be flushed")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='quiz-load-')
+    # Must be set before the app's modules are imported
+    os.environ['QUIZ_TRANSLATION_CACHE'] = os.path.join(workdir, 'translations.sqlite3')
+    if args.backend == 'sqlite':
+        os.environ['QUIZ_STORAGE_BACKEND'] = 'sqlite'
+        os.environ['QUIZ_SQLITE_PATH'] = os.path.join(workdir, 'quiz_data.sqlite3')
+
+    import stand_ins
+    os.chdir(REPO_ROOT)
+    if args.backend == 'sqlite':
+        stand_ins.install_local_storage()
+        count_sqlite_calls()
+    else:
+        stand_ins.install(latency=args.latency_ms / 1000)
+    stand_ins.install_translator(latency=args.translate_ms / 1000)
+    count_script_runs()
+
+    script = os.path.join(REPO_ROOT, 'quiz_webapp.py')
+    # Warm up shared resources (banks, caches, background threads) outside the measurement
+    for _ in simulate_student(script, 2, args.seed, []):
+        pass
+    recorder.__init__()
+    stand_ins.CALLS.clear()
+
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    state_sizes, sessions = run_students(script, args)
+    wall = time.perf_counter() - started
+    time.sleep(args.settle)
+    report(args, wall, state_sizes, rss_bytes() - rss_before)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Local stand-ins for the services quiz_webapp.py talks to, so the app can be
+driven with Streamlit's AppTest without a Firestore project or a browser.
+
+install() patches firestore.Client.from_service_account_info and
+streamlit_local_storage.LocalStorage; call it before creating an AppTest.
+install_translator() replaces googletrans.Translator the same way.
+The Google client libraries are only imported by install(), so
+install_local_storage() alone keeps them out of startup measurements.
+"""
+import asyncio
+import copy
+import threading
+import time
+import uuid
+from collections import Counter
+
+# Firestore calls made through the stand-in, by operation name ('get', 'set', ...)
+CALLS = Counter()
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FakeDocument:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self.id = doc_id or uuid.uuid4().hex
+        self._key = (collection, self.id)
+        self.path = f"{collection}/{self.id}"
+
+    def _call(self, op):
+        CALLS[op] += 1
+        if self._client.latency:
+            time.sleep(self._client.latency)
+
+    def get(self):
+        self._call('get')
+        with self._client.lock:
+            return FakeSnapshot(copy.deepcopy(self._client.docs.get(self._key)))
+
+    def set(self, data, merge=False):
+        self._call('set')
+        with self._client.lock:
+            if merge and self._key in self._client.docs:
+                self._client.docs[self._key].update(copy.deepcopy(data))
+            else:
+                self._client.docs[self._key] = copy.deepcopy(data)
+
+    def create(self, data):
+        from google.api_core.exceptions import AlreadyExists
+        self._call('create')
+        with self._client.lock:
+            if self._key in self._client.docs:
+                raise AlreadyExists(f"Document already exists: {self.id}")
+            self._client.docs[self._key] = copy.deepcopy(data)
+
+    def update(self, data):
+        self._call('update')
+        with self._client.lock:
+            self._apply_update(data)
+
+    def _apply_update(self, data):
+        from google.api_core.exceptions import NotFound
+        if self._key not in self._client.docs:
+            raise NotFound(f"No document to update: {self.id}")
+        doc = self._client.docs[self._key]
+        for field, value in data.items():
+            *parents, name = field.split('.')
+            target = doc
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[name] = copy.deepcopy(value)
+
+
+class FakeBatch:
+    """WriteBatch stand-in: applies its set()/update() calls atomically in one 'commit' call."""
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append(('set', ref, copy.deepcopy(data)))
+
+    def update(self, ref, data):
+        self._writes.append(('update', ref, copy.deepcopy(data)))
+
+    def commit(self):
+        from google.api_core.exceptions import NotFound
+        CALLS['commit'] += 1
+        CALLS['batched_writes'] += len(self._writes)
+        if self._client.latency:
+            time.sleep(self._client.latency)
+        with self._client.lock:
+            missing = [ref for kind, ref, _ in self._writes
+                       if kind == 'update' and ref._key not in self._client.docs]
+            if missing:
+                raise NotFound(f"No document to update: {missing[0].id}")
+            for kind, ref, data in self._writes:
+                if kind == 'set':
+                    self._client.docs[ref._key] = data
+                else:
+                    ref._apply_update(data)
+
+
+class FakeCollection:
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def document(self, doc_id=None):
+        return FakeDocument(self._client, self._name, doc_id)
+
+
+class FakeFirestoreClient:
+    """In-memory Firestore client with an optional per-call latency in seconds."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.docs = {}
+        self.lock = threading.Lock()
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+class FakeLocalStorage:
+    """Browser local storage stand-in shared by every simulated session."""
+    items = {}
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def getItem(self, itemKey):
+        return self.items.get(itemKey)
+
+    def setItem(self, itemKey=None, itemValue=None, key='set'):
+        self.items[itemKey] = itemValue
+
+    def deleteItem(self, itemKey, key='deleteItem'):
+        self.items.pop(itemKey, None)
+
+
+class FakeTranslation:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeTranslator:
+    """googletrans.Translator stand-in that answers '[<lang>] <text>' after `latency` seconds."""
+    latency = 0.0
+
+    async def translate(self, text, src='auto', dest='en'):
+        CALLS['translate'] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return FakeTranslation(f"[{dest}] {text}")
+
+
+def install_translator(latency=0.0):
+    """Routes the app's Google Translate calls to the stand-in."""
+    import googletrans
+
+    FakeTranslator.latency = latency
+    googletrans.Translator = FakeTranslator
+
+
+def install_local_storage():
+    """Routes the app's browser local storage to the stand-in."""
+    import streamlit_local_storage
+
+    streamlit_local_storage.LocalStorage = FakeLocalStorage
+
+
+def install(latency=0.0):
+    """Routes the app's Firestore client and local storage to the stand-ins."""
+    from google.cloud import firestore
+
+    client = FakeFirestoreClient(latency)
+    firestore.Client.from_service_account_info = staticmethod(lambda *args, **kwargs: client)
+    install_local_storage()
+    return client
@@ -0,0 +1,249 @@
+"""
+Server-wide metrics for the quiz web app.
+
+Every session on a Streamlit server shares one MetricsRegistry, which
+aggregates timing spans (as latency histograms), counters, per-session
+counters and per-session values (like each session's memory footprint), and
+renders them in the Prometheus text format. They can be read on the app's
+admin view (open the app with ?admin=<QUIZ_ADMIN_TOKEN>) or written to a file
+for node_exporter's textfile collector:
+
+    QUIZ_METRICS_FILE=/var/lib/node_exporter/quiz.prom streamlit run quiz_webapp.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+METRICS_FILE = os.environ.get('QUIZ_METRICS_FILE')
+METRICS_FILE_INTERVAL = 15.0
+ADMIN_TOKEN = os.environ.get('QUIZ_ADMIN_TOKEN')
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Sessions not seen for this many seconds no longer count as active and lose their counters
+SESSION_TIMEOUT = 30 * 60
+
+PREFIX = 'quiz'
+
+
+class Histogram:
+    """Latency histogram with fixed buckets; not thread-safe on its own."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (inf if it is past the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class SessionCounters:
+    """Counters and span totals of one browser session."""
+
+    def __init__(self):
+        self.counters = Counter()
+        self.spans = {}  # span name -> [calls, seconds]
+        self.values = {}  # value name -> latest value, like the session's memory footprint
+        self.last_seen = time.time()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """Thread-safe spans, counters and gauges, exportable in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._counters = Counter()
+        self._sessions = {}
+        self._gauges = {}
+        self._writer = None
+
+    # --- Recording ---
+    def _session(self, session):
+        """Returns the counters of a session key (callers hold the lock)."""
+        counters = self._sessions.get(session)
+        if counters is None:
+            counters = self._sessions[session] = SessionCounters()
+            self._counters['sessions'] += 1
+        counters.last_seen = time.time()
+        return counters
+
+    def observe(self, name, seconds, session=None):
+        """Records one span of `seconds`, for the server and, if given, the session key."""
+        with self._lock:
+            histogram = self._spans.get(name)
+            if histogram is None:
+                histogram = self._spans[name] = Histogram()
+            histogram.observe(seconds)
+            if session is not None:
+                totals = self._session(session).spans.setdefault(name, [0, 0.0])
+                totals[0] += 1
+                totals[1] += seconds
+
+    @contextmanager
+    def span(self, name, session=None):
+        """Times the body of a with statement as span `name`, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, session)
+
+    def inc(self, name, session=None, amount=1):
+        """Adds to counter `name`, for the server and, if given, the session key."""
+        with self._lock:
+            self._counters[name] += amount
+            if session is not None:
+                self._session(session).counters[name] += amount
+
+    def set_session_value(self, name, session, value):
+        """Records the latest value of a per-session quantity; the server exports their sum and max."""
+        if session is None:
+            return
+        with self._lock:
+            self._session(session).values[name] = value
+
+    def add_gauges(self, group, collect):
+        """Exports the numbers in the dict returned by collect() as gauges named <group>_<key>."""
+        with self._lock:
+            self._gauges[group] = collect
+
+    # --- Reading ---
+    def _prune_sessions(self):
+        """Forgets sessions that timed out (callers hold the lock)."""
+        cutoff = time.time() - SESSION_TIMEOUT
+        for session in [s for s, c in self._sessions.items() if c.last_seen < cutoff]:
+            del self._sessions[session]
+
+    def session_snapshot(self, session):
+        """Returns ({counter: value}, {span: (calls, seconds)}) for a session key."""
+        with self._lock:
+            counters = self._sessions.get(session)
+            if counters is None:
+                return {}, {}
+            return dict(counters.counters), {name: tuple(v) for name, v in counters.spans.items()}
+
+    def counters(self):
+        """Returns the server-wide counters plus the number of active sessions."""
+        with self._lock:
+            self._prune_sessions()
+            return {**self._counters, 'active_sessions': len(self._sessions)}
+
+    def session_values(self, name):
+        """Returns the sessions reporting value `name`, and the sum and max of their latest values."""
+        with self._lock:
+            self._prune_sessions()
+            values = [c.values[name] for c in self._sessions.values() if name in c.values]
+        return {'sessions': len(values), 'sum': sum(values), 'max': max(values, default=0)}
+
+    def span_table(self):
+        """Returns rows of span name, calls, mean/p50/p95 in ms and total seconds."""
+        with self._lock:
+            return [{
+                'span': name,
+                'calls': h.count,
+                'mean_ms': h.sum / h.count * 1000 if h.count else 0.0,
+                'p50_ms': h.quantile(0.50) * 1000,
+                'p95_ms': h.quantile(0.95) * 1000,
+                'total_s': h.sum,
+            } for name, h in sorted(self._spans.items())]
+
+    def _collect_gauges(self):
+        with self._lock:
+            groups = list(self._gauges.items())
+        gauges = {}
+        for group, collect in groups:
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"metrics: collecting {group} gauges failed: {e}", file=sys.stderr)
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    gauges[f"{group}_{key}"] = value
+        return gauges
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        gauges = self._collect_gauges()
+        lines = []
+        with self._lock:
+            self._prune_sessions()
+            lines += [f"# HELP {PREFIX}_span_seconds Time spent in instrumented app functions.",
+                      f"# TYPE {PREFIX}_span_seconds histogram"]
+            for name, h in sorted(self._spans.items()):
+                label = f'span="{_escape(name)}"'
+                cumulative = 0
+                for bound, count in zip(h.buckets + ('+Inf',), h.counts):
+                    cumulative += count
+                    lines.append(f'{PREFIX}_span_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{PREFIX}_span_seconds_sum{{{label}}} {h.sum:.6f}')
+                lines.append(f'{PREFIX}_span_seconds_count{{{label}}} {h.count}')
+            for name, value in sorted(self._counters.items()):
+                lines += [f"# TYPE {PREFIX}_{name}_total counter", f"{PREFIX}_{name}_total {value}"]
+            lines += [f"# HELP {PREFIX}_active_sessions Sessions seen in the last {SESSION_TIMEOUT} seconds.",
+                      f"# TYPE {PREFIX}_active_sessions gauge",
+                      f"{PREFIX}_active_sessions {len(self._sessions)}"]
+            names = sorted({name for c in self._sessions.values() for name in c.values})
+            for name in names:
+                values = [c.values[name] for c in self._sessions.values() if name in c.values]
+                lines += [f"# HELP {PREFIX}_session_{name} Latest {name} of the active sessions.",
+                          f"# TYPE {PREFIX}_session_{name} gauge",
+                          f'{PREFIX}_session_{name}{{stat="sum"}} {sum(values)}',
+                          f'{PREFIX}_session_{name}{{stat="max"}} {max(values)}']
+        for name, value in sorted(gauges.items()):
+            lines += [f"# TYPE {PREFIX}_{name} gauge", f"{PREFIX}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    # --- Text file export ---
+    def write_textfile(self, path):
+        """Writes render() to path via a temporary file, so collectors never read a partial file."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def start_textfile_writer(self, path, interval=METRICS_FILE_INTERVAL):
+        """Rewrites the metrics file every `interval` seconds from a daemon thread."""
+        def run():
+            while True:
+                try:
+                    self.write_textfile(path)
+                except OSError as e:
+                    print(f"metrics: could not write {path}: {e}", file=sys.stderr)
+                time.sleep(interval)
+
+        if self._writer is None:
+            self._writer = threading.Thread(target=run, name="metrics-textfile", daemon=True)
+            self._writer.start()
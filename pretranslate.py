@@ -0,0 +1,119 @@
+"""
+Pre-translates every subject bank into every supported language.
+
+    python pretranslate.py                                # everything
+    python pretranslate.py --lang en --subject "MRPL Study Case"
+
+Translated rows are appended to the sidecar banks (see translation.py) as soon
+as they finish, so an interrupted or partly failed run can simply be started
+again and only translates what is still missing. Translations are also written
+to the shared translation cache.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from googletrans import Translator
+
+from question_bank import SUBJECT_FILES, open_bank
+from translation import (AVAILABLE_LANGUAGES, DEFAULT_LANGUAGE, TranslationScheduler,
+                         append_sidecar_rows, question_texts, read_sidecar, sidecar_path_for,
+                         source_fingerprint)
+from translation_cache import TranslationCache
+
+
+def make_translate(translator, cache):
+    """Returns the scheduler's translate callable: shared cache first, then Google Translate."""
+    async def translate(text, src_lang, dest_lang):
+        cached = cache.get(text, dest_lang)
+        if cached is not None:
+            return cached
+        result = await translator.translate(text, src=src_lang, dest=dest_lang)
+        if not result.text:
+            raise ValueError("Empty translation result")
+        cache.put(text, dest_lang, result.text)
+        return result.text
+    return translate
+
+
+async def translate_question(scheduler, question, lang):
+    """Translates one question and its options into a sidecar row, or None if any text failed."""
+    texts = question_texts([question])
+    translated = await scheduler.translate_many(texts, DEFAULT_LANGUAGE, lang)
+    if any(text is None for text in translated):
+        return None
+    return {
+        'id': question['id'],
+        'source': source_fingerprint(question),
+        'question': translated[0],
+        'options': translated[1:]
+    }
+
+
+async def pretranslate_bank(scheduler, label, csv_path, lang):
+    """Fills in the sidecar bank of one subject and language; returns the number of failed rows."""
+    bank = open_bank(csv_path)
+    path = sidecar_path_for(csv_path, lang)
+    done = read_sidecar(path)
+    todo = [q for q in bank
+            if q['id'] not in done or done[q['id']].get('source') != source_fingerprint(q)]
+    total = len(bank)
+    completed = total - len(todo)
+    failed = 0
+    started = time.time()
+
+    def report(end='\r'):
+        print(f"[{label} -> {lang}] {completed}/{total} translated, {failed} failed, "
+              f"{time.time() - started:.0f}s", end=end, flush=True)
+
+    # The scheduler limits the number of simultaneous calls across all questions
+    tasks = [asyncio.ensure_future(translate_question(scheduler, q, lang)) for q in todo]
+    for task in asyncio.as_completed(tasks):
+        row = await task
+        if row is None:
+            failed += 1
+        else:
+            append_sidecar_rows(path, [row])
+            completed += 1
+        report()
+    report(end='\n')
+    return failed
+
+
+async def main_async(args):
+    scheduler = TranslationScheduler(make_translate(Translator(), TranslationCache()),
+                                     max_concurrency=args.concurrency, max_retries=args.retries,
+                                     backoff=args.backoff)
+    failed = 0
+    for label, csv_path in SUBJECT_FILES.items():
+        if args.subject and label not in args.subject:
+            continue
+        for lang in AVAILABLE_LANGUAGES:
+            if lang == DEFAULT_LANGUAGE or (args.lang and lang not in args.lang):
+                continue
+            failed += await pretranslate_bank(scheduler, label, csv_path, lang)
+    print(f"Translation calls: {scheduler.stats.summary()}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subject', action='append', choices=list(SUBJECT_FILES),
+                        help="only this subject (repeatable)")
+    parser.add_argument('--lang', action='append',
+                        choices=[lang for lang in AVAILABLE_LANGUAGES if lang != DEFAULT_LANGUAGE],
+                        help="only this language (repeatable)")
+    parser.add_argument('--concurrency', type=int, default=8, help="simultaneous translation calls")
+    parser.add_argument('--retries', type=int, default=4, help="retries per failed text")
+    parser.add_argument('--backoff', type=float, default=1.0, help="first retry delay in seconds")
+    args = parser.parse_args()
+
+    failed = asyncio.run(main_async(args))
+    if failed:
+        print(f"{failed} questions could not be translated; run again to retry them.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,701 @@
+"""
+Compiled question banks.
+
+Each multichoice-uts-*.csv can be compiled into a compact binary .qbank file
+that is memory-mapped at load time, so a worker can serve a subject without
+importing pandas or re-parsing the CSV.
+
+File layout (little-endian):
+    header       magic, version, question/option counts, source size + mtime,
+                 source content hash, next unused question ID
+    questions    one record per question: text offset/length, first option,
+                 option count, answer index (-1 if no option matches),
+                 question ID, hash of the CSV row it was parsed from
+    options      one record per option: text offset (from the start of its
+                 question's text)/length, letter (NUL if none)
+    blob         UTF-8 text referenced by the two tables above; the text of a
+                 question is followed by the texts of its options
+
+Question IDs are stable: when a CSV changes, rows whose content is unchanged
+keep their ID (and are copied from the previous bank instead of re-parsed), an
+edited row keeps the ID of the row it replaced (the one in the same place
+relative to the unchanged rows before it), and new rows get IDs that were never
+used before. A bank's version is the hash of the CSV it was
+compiled from. BankManager keeps the banks up to date and keeps earlier
+versions next to the current one (as <name>.<version>.qbank), so a quiz
+drawn from a version can be resumed from it after the CSV changed.
+
+Run `python question_bank.py` to compile the banks of every subject.
+"""
+import csv
+import glob
+import hashlib
+import io
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Sequence
+
+# Subject name -> question CSV
+SUBJECT_FILES = {
+    "Manajemen dan Keberlanjutan (Mankeb)": "multichoice-uts-mankeb.csv",
+    "Pemasaran Strategik (Pastra)": "multichoice-uts-pastra.csv",
+    "Manajemen Rantai Pasok dan Logistik (MRPL)": "multichoice-uts-mrpl.csv",
+    "MRPL PPT Only": "multichoice-uts-mrpl-ppt-only.csv",
+    "MRPL Study Case": "multichoice-uts-mrpl-studycase.csv"
+}
+
+# CSV column names
+CSV_QUESTION_COL = 'Pertanyaan'
+CSV_OPTIONS_COL = 'Pilihan Ganda'
+CSV_ANSWER_COL = 'Jawaban'
+
+BANK_SUFFIX = '.qbank'
+BANK_MAGIC = b'QBNK'
+BANK_VERSION = 3
+
+HEADER = struct.Struct('<4sHHIIqq16sI')
+QUESTION_RECORD = struct.Struct('<IIIHhI8s')
+OPTION_RECORD = struct.Struct('<II1s')
+
+# CSVs this large (bytes) are compiled by bank_ingest.py, in chunks and in worker processes
+PARALLEL_INGEST_BYTES = 16 << 20
+# Earlier versions of each bank kept on disk and open in memory, for quizzes drawn from them
+BANK_VERSIONS_KEPT = 8
+# How often BankManager.start_watching() checks the CSV files for changes (seconds)
+BANK_WATCH_INTERVAL = 5.0
+
+# 'a. Foo', 'A.Foo' and 'D Foo' all mean option D with text 'Foo'
+OPTION_PATTERN = re.compile(r'([A-Za-z])(?:\s*\.\s*|\s+)(.*)', re.DOTALL)
+
+
+def split_option(option):
+    """Splits an option like 'a. Foo' into ('a', 'Foo'); an option without a letter gets ''."""
+    match = OPTION_PATTERN.fullmatch(option)
+    if match is None:
+        return '', option
+    return match.group(1), match.group(2)
+
+
+def format_option(letter, text):
+    """Inverse of split_option, for display."""
+    return f"{letter}. {text}" if letter else text
+
+
+def answer_index_for(options, answer):
+    """Returns the index of the (letter, text) option whose letter is `answer`, or -1."""
+    answer = answer.lower().strip()
+    return next((i for i, (letter, _) in enumerate(options) if letter.lower() == answer), -1)
+
+
+def row_fields(row):
+    """Returns the (question, options, answer) texts of a CSV row, or None if incomplete."""
+    fields = row[CSV_QUESTION_COL], row[CSV_OPTIONS_COL], row[CSV_ANSWER_COL]
+    return fields if all(fields) else None
+
+
+def parse_fields(question, options_text, answer):
+    """Parses the texts of a CSV row into (question, options, answer_index)."""
+    options = [split_option(opt.strip()) for opt in options_text.split('\n')]
+    return question, options, answer_index_for(options, answer)
+
+
+def option_problems(options, answer_index):
+    """Returns what looks wrong with the parsed options of a question, as a list of short descriptions."""
+    letters = [letter.lower() for letter, _ in options if letter]
+    problems = []
+    if len(options) < 2:
+        problems.append("fewer than two options")
+    if len(letters) < len(options):
+        problems.append("option without a letter")
+    if len(set(letters)) < len(letters):
+        problems.append("duplicate option letters")
+    if answer_index < 0:
+        problems.append("answer matches no option")
+    return problems
+
+
+def parse_row(row):
+    """Parses one CSV row into (question, options, answer_index), or None if incomplete."""
+    fields = row_fields(row)
+    return None if fields is None else parse_fields(*fields)
+
+
+def row_hash(fields):
+    """Hash of the texts of a CSV row, to recognise unchanged rows."""
+    return hashlib.blake2b('\x1f'.join(fields).encode('utf-8'), digest_size=8).digest()
+
+
+def content_hasher():
+    """Returns a hash object for the bytes of a CSV file, to hash it block by block (see content_hash)."""
+    return hashlib.blake2b(digest_size=16)
+
+
+def content_hash(data):
+    """Hash of the bytes of a CSV file; its first 12 hex digits are the bank version."""
+    hasher = content_hasher()
+    hasher.update(data)
+    return hasher.digest()
+
+
+def question_from_legacy(question):
+    """Converts a question dict with 'a. Foo' option strings and an 'answer' letter to the current layout."""
+    if 'answer_index' in question:
+        return question
+    options = [split_option(opt) for opt in question['options']]
+    return {
+        'id': question.get('id'),
+        'question': question['question'],
+        'options': options,
+        'answer_index': answer_index_for(options, question.get('answer', ''))
+    }
+
+
+def read_raw_rows(f):
+    """Yields the (question, options, answer) texts of the complete rows of an open question CSV."""
+    reader = csv.DictReader(f)
+    missing = [col for col in (CSV_QUESTION_COL, CSV_OPTIONS_COL, CSV_ANSWER_COL)
+               if col not in (reader.fieldnames or [])]
+    if missing:
+        raise KeyError(missing[0])
+    for row in reader:
+        fields = row_fields(row)
+        if fields is not None:
+            yield fields
+
+
+def read_csv_rows(csv_path):
+    """Yields parsed rows from a question CSV, skipping incomplete ones."""
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for fields in read_raw_rows(f):
+            yield parse_fields(*fields)
+
+
+def bank_path_for(csv_path, version=None):
+    """Returns the path of the compiled bank that belongs to a CSV file, or of an earlier version of it."""
+    base = os.path.splitext(csv_path)[0]
+    return f"{base}.{version}{BANK_SUFFIX}" if version else base + BANK_SUFFIX
+
+
+def encode_bank(rows, source_size=0, source_mtime_ns=0, source_hash=b'', next_id=0, previous=None):
+    """
+    Encodes rows into bank bytes. A row is either (question ID, row hash,
+    question, [(letter, text), ...], answer_index), or (question ID, row hash,
+    position) to copy the question at that position of the `previous` bank.
+    """
+    blob = bytearray()
+    question_table = bytearray()
+    option_table = bytearray()
+    num_questions = 0
+    num_options = 0
+    max_id = -1
+
+    for row in rows:
+        question_id, hash_ = row[0], row[1]
+        text_off = len(blob)
+        if len(row) == 3:
+            record, option_records, text = previous.row_data(row[2])
+            text_len, count, answer_index = record[1], record[3], record[4]
+            option_table += option_records
+            blob += text
+        else:
+            question, options, answer_index = row[2:]
+            blob += question.encode('utf-8')
+            text_len = len(blob) - text_off
+            for letter, option in options:
+                data = option.encode('utf-8')
+                option_table += OPTION_RECORD.pack(len(blob) - text_off, len(data), letter.encode('ascii'))
+                blob += data
+            count = len(options)
+        question_table += QUESTION_RECORD.pack(text_off, text_len, num_options, count, answer_index,
+                                               question_id, hash_)
+        num_questions += 1
+        num_options += count
+        max_id = max(max_id, question_id)
+
+    header = HEADER.pack(BANK_MAGIC, BANK_VERSION, 0, num_questions, num_options,
+                         source_size, source_mtime_ns, source_hash, max(max_id + 1, next_id))
+    return b''.join((header, question_table, option_table, blob))
+
+
+class QuestionIds:
+    """
+    Numbers the rows of a CSV in order, keeping the question IDs of a previous
+    bank of it (see the module docstring). An edited row is lined up with the
+    previous rows by the last unchanged row before it, so it keeps its ID when
+    rows were also added or removed elsewhere.
+    """
+
+    def __init__(self, previous):
+        self.next_id = previous.next_id
+        self.changed = []  # (position, previous position it lines up with) of rows numbered by finish()
+        self._previous_keys = previous.row_keys()
+        self._unchanged = {}
+        for index, (question_id, hash_) in enumerate(self._previous_keys):
+            self._unchanged.setdefault(hash_, []).append((question_id, index))
+        self._anchor = (-1, -1)  # (position, previous position) of the last unchanged row
+
+    def match(self, position, hash_):
+        """Returns (ID, previous position) of the row at `position` if it is unchanged, else None."""
+        matches = self._unchanged.get(hash_)
+        if matches:
+            self._anchor = (position, matches[0][1])
+            return matches.pop(0)
+        self.changed.append((position, self._anchor[1] + position - self._anchor[0]))
+        return None
+
+    def finish(self):
+        """Returns {position: ID} for the new and changed rows, once every row has been matched."""
+        # IDs of previous rows not found unchanged, which an edited row can take over
+        free = {question_id for matches in self._unchanged.values() for question_id, _ in matches}
+        ids = {}
+        for position, index in self.changed:
+            if index < len(self._previous_keys) and self._previous_keys[index][0] in free:
+                ids[position] = self._previous_keys[index][0]
+                free.discard(ids[position])
+            else:
+                ids[position] = self.next_id
+                self.next_id += 1
+        return ids
+
+
+def numbered_rows(raw_rows, previous):
+    """
+    Returns (rows for encode_bank, rows parsed) for the raw rows of a CSV,
+    keeping the IDs of a previous bank of it (see QuestionIds). Rows found
+    unchanged in the previous bank are copied from it; the rest are parsed.
+    """
+    ids = QuestionIds(previous)
+    rows = []
+    for fields in raw_rows:
+        hash_ = row_hash(fields)
+        match = ids.match(len(rows), hash_)
+        if match:
+            rows.append((match[0], hash_, match[1]))
+        else:
+            rows.append((hash_,) + parse_fields(*fields))
+    for position, question_id in ids.finish().items():
+        rows[position] = (question_id,) + rows[position]
+    return rows, len(ids.changed)
+
+
+def build_bank(csv_path, previous=None):
+    """
+    Returns (bank bytes, rows parsed) for a question CSV. With a previous bank
+    of it, its question IDs are kept and only new or changed rows are parsed;
+    without one, IDs are the row positions.
+    """
+    stat = os.stat(csv_path)
+    with open(csv_path, 'rb') as f:
+        data = f.read()
+    raw_rows = read_raw_rows(io.StringIO(data.decode('utf-8-sig'), newline=''))
+    if previous is None:
+        # Streamed, so the parsed rows never pile up in memory
+        rows = ((question_id, row_hash(fields)) + parse_fields(*fields)
+                for question_id, fields in enumerate(raw_rows))
+        bank = encode_bank(rows, stat.st_size, stat.st_mtime_ns, content_hash(data))
+        return bank, HEADER.unpack_from(bank)[3]
+    rows, reparsed = numbered_rows(raw_rows, previous)
+    bank = encode_bank(rows, stat.st_size, stat.st_mtime_ns, content_hash(data), previous.next_id, previous)
+    return bank, reparsed
+
+
+def write_atomic(path, *parts):
+    """
+    Writes parts (bytes-like objects, or binary files copied from their current
+    position) to path via a temporary file so readers never see a partial bank.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for part in parts:
+                if hasattr(part, 'read'):
+                    shutil.copyfileobj(part, f)
+                else:
+                    f.write(part)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def archive_bank(bank_path, version, versions_kept=BANK_VERSIONS_KEPT):
+    """
+    Keeps the bank file at bank_path under its version's name, as
+    <name>.<version>.qbank, and prunes all but the newest `versions_kept`.
+    """
+    archive_path = bank_path_for(bank_path, version)
+    if not os.path.exists(archive_path):
+        try:
+            os.link(bank_path, archive_path)
+        except OSError:
+            with open(bank_path, 'rb') as f:
+                write_atomic(archive_path, f)
+    pattern = os.path.splitext(bank_path)[0] + '.' + '[0-9a-f]' * 12 + BANK_SUFFIX
+    archives = sorted(glob.glob(pattern), key=os.path.getmtime)
+    for old_path in archives[:-versions_kept]:
+        os.remove(old_path)
+
+
+def compile_bank(csv_path, bank_path=None, previous=None):
+    """
+    Compiles a question CSV into a .qbank file and returns the bank path; see
+    build_bank for `previous`. open_bank() keeps question IDs stable across changes.
+    """
+    bank_path = bank_path or bank_path_for(csv_path)
+    data, _ = build_bank(csv_path, previous)
+    write_atomic(bank_path, data)
+    return bank_path
+
+
+class QuestionBank:
+    """Read-only view over a memory-mapped .qbank file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size or self._mm[:4] != BANK_MAGIC:
+            self._mm.close()
+            raise ValueError(f"'{path}' is not a question bank")
+        (magic, version, _flags, self._num_questions, self._num_options,
+         self.source_size, self.source_mtime_ns, self.source_hash, self.next_id) = HEADER.unpack_from(self._mm, 0)
+        if version != BANK_VERSION:
+            self._mm.close()
+            raise ValueError(f"'{path}' is not a version {BANK_VERSION} question bank")
+        self.version = self.source_hash.hex()[:12]
+        self._question_base = HEADER.size
+        self._option_base = self._question_base + self._num_questions * QUESTION_RECORD.size
+        self._blob_base = self._option_base + self._num_options * OPTION_RECORD.size
+        self._records = None
+        self._index = None
+        self._questions = None
+
+    def __len__(self):
+        return self._num_questions
+
+    def __iter__(self):
+        for i in range(self._num_questions):
+            yield self.question(i)
+
+    def _text(self, offset, length):
+        start = self._blob_base + offset
+        return self._mm[start:start + length].decode('utf-8')
+
+    def _option(self, i, question_offset):
+        offset, length, letter = OPTION_RECORD.unpack_from(self._mm, self._option_base + i * OPTION_RECORD.size)
+        return letter.rstrip(b'\0').decode('ascii'), self._text(question_offset + offset, length)
+
+    def question(self, index):
+        """
+        Returns the question at position `index` as a dict: 'id', 'question',
+        'options' as (letter, text) pairs and 'answer_index' (-1 if no option is correct).
+        """
+        if not 0 <= index < self._num_questions:
+            raise IndexError(index)
+        text_off, text_len, first_option, num_options, answer_index, question_id, _ = QUESTION_RECORD.unpack_from(
+            self._mm, self._question_base + index * QUESTION_RECORD.size)
+        return {
+            'id': question_id,
+            'question': self._text(text_off, text_len),
+            'options': [self._option(i, text_off) for i in range(first_option, first_option + num_options)],
+            'answer_index': answer_index
+        }
+
+    def questions(self):
+        """Returns the SharedQuestions of this bank; the same object on every call."""
+        if self._questions is None:
+            self._questions = SharedQuestions(self)
+        return self._questions
+
+    def _all_records(self):
+        if self._records is None:
+            self._records = list(QUESTION_RECORD.iter_unpack(self._mm[self._question_base:self._option_base]))
+        return self._records
+
+    def row_keys(self):
+        """Returns the (question ID, row hash) of every position."""
+        return [record[5:] for record in self._all_records()]
+
+    def row_data(self, index):
+        """Returns the question record, option records and text of position `index`, for encode_bank to copy."""
+        records = self._all_records()
+        record = records[index]
+        text_end = records[index + 1][0] if index + 1 < len(records) else len(self._mm) - self._blob_base
+        options_start = self._option_base + record[2] * OPTION_RECORD.size
+        text_start = self._blob_base + record[0]
+        return (record, self._mm[options_start:options_start + record[3] * OPTION_RECORD.size],
+                self._mm[text_start:self._blob_base + text_end])
+
+    def index_of(self, question_id):
+        """Returns the position of a question ID; raises KeyError if this version has no such question."""
+        if self._index is None:
+            self._index = {record[5]: index for index, record in enumerate(self._all_records())}
+        return self._index[question_id]
+
+    def to_list(self):
+        """Decodes every question into a list of dictionaries."""
+        return list(self)
+
+    def is_stale(self, csv_path):
+        """True if csv_path changed since this bank was compiled."""
+        try:
+            stat = os.stat(csv_path)
+        except FileNotFoundError:
+            # Deployments may ship only the compiled banks
+            return False
+        return (stat.st_size, stat.st_mtime_ns) != (self.source_size, self.source_mtime_ns)
+
+    def restamp(self, csv_path):
+        """
+        Records the current size and mtime of csv_path after a change that left its
+        content as it was (a touch or a save without edits), so it is not hashed again.
+        """
+        stat = os.stat(csv_path)
+        self.source_size, self.source_mtime_ns = stat.st_size, stat.st_mtime_ns
+        header = HEADER.pack(BANK_MAGIC, BANK_VERSION, 0, self._num_questions, self._num_options,
+                             self.source_size, self.source_mtime_ns, self.source_hash, self.next_id)
+        try:
+            with memoryview(self._mm) as view:
+                write_atomic(self.path, header, view[HEADER.size:])
+        except OSError:
+            pass
+
+    def close(self):
+        self._mm.close()
+
+
+class SharedQuestions(Sequence):
+    """
+    The questions of a bank as a read-only sequence of dicts, each decoded the
+    first time it is looked up and then shared by every caller, so neither may
+    be modified. A huge bank only keeps the questions that were asked in
+    memory; iterating decodes the questions without keeping them.
+    """
+
+    def __init__(self, bank):
+        self._bank = bank
+        self._decoded = {}
+
+    def __len__(self):
+        return len(self._bank)
+
+    def __getitem__(self, index):
+        try:
+            return self._decoded[index]
+        except KeyError:
+            pass
+        if index < 0:
+            index += len(self._bank)
+            if index in self._decoded:
+                return self._decoded[index]
+        # setdefault, so threads decoding the same question at once still share one dict
+        return self._decoded.setdefault(index, self._bank.question(index))
+
+    def __iter__(self):
+        for index in range(len(self._bank)):
+            yield self._decoded.get(index) or self._bank.question(index)
+
+
+def _open_valid(bank_path):
+    """Maps a bank file, or returns None if it is missing or unreadable."""
+    try:
+        return QuestionBank(bank_path)
+    except (OSError, ValueError):
+        return None
+
+
+def _file_hash(path):
+    hasher = content_hasher()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(block)
+    return hasher.digest()
+
+
+class BankManager:
+    """
+    Keeps the compiled banks of question CSVs up to date. A changed CSV (new
+    size or mtime, and a new content hash) is recompiled incrementally on the
+    next open() or watcher pass; earlier versions stay available, up to
+    BANK_VERSIONS_KEPT per bank. Banks stay mapped while they are in use, and
+    the OS shares the pages between workers. Safe to share between threads:
+    a CSV is compiled by one thread at a time, while the banks of other CSVs
+    stay available.
+    """
+
+    def __init__(self, versions_kept=BANK_VERSIONS_KEPT):
+        self.versions_kept = versions_kept
+        self._current = {}  # CSV path -> QuestionBank
+        self._earlier = {}  # (CSV path, version) -> QuestionBank, oldest first
+        self._lock = threading.Lock()  # guards the two dicts above and _compiling
+        self._compiling = {}  # CSV path -> lock held while checking or compiling its bank
+        self._watcher = None
+
+    def open(self, csv_path, version=None):
+        """
+        Returns the current bank of csv_path, or the bank of an earlier
+        version; raises ValueError if that version is no longer kept.
+        """
+        bank = self._refresh(csv_path)
+        if version is None or version == bank.version:
+            return bank
+        with self._lock:
+            return self._open_earlier(csv_path, version)
+
+    def _bank_paths(self, csv_path):
+        """The bank path next to the CSV, and the one in the temp directory for read-only checkouts."""
+        path = bank_path_for(csv_path)
+        return path, os.path.join(tempfile.gettempdir(), os.path.basename(path))
+
+    def _refresh(self, csv_path):
+        """Returns the current bank of csv_path, compiling it if it is missing or the CSV changed."""
+        with self._lock:
+            bank = self._current.get(csv_path)
+            compiling = self._compiling.setdefault(csv_path, threading.Lock())
+        if bank is not None and not bank.is_stale(csv_path):
+            return bank
+        with compiling:
+            # Another thread may have compiled it meanwhile
+            with self._lock:
+                bank = self._current.get(csv_path)
+            if bank is not None and not bank.is_stale(csv_path):
+                return bank
+            return self._compile(csv_path, bank)
+
+    def _compile(self, csv_path, bank):
+        """Brings the bank of csv_path up to date, from `bank` (None if there is none yet); callers hold its lock."""
+        if bank is None:
+            # Use a bank compiled earlier, by this or another worker, if it is up to date
+            candidates = [b for b in map(_open_valid, self._bank_paths(csv_path)) if b is not None]
+            fresh = [b for b in candidates if not b.is_stale(csv_path)]
+            bank = (fresh or candidates or [None])[0]
+            for other in candidates:
+                if other is not bank:
+                    other.close()
+            if bank is not None and not bank.is_stale(csv_path):
+                with self._lock:
+                    self._current[csv_path] = bank
+                return bank
+
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(csv_path)
+        if bank is not None and _file_hash(csv_path) == bank.source_hash:
+            bank.restamp(csv_path)
+            with self._lock:
+                self._current[csv_path] = bank
+            return bank
+
+        started = time.perf_counter()
+        if os.path.getsize(csv_path) < PARALLEL_INGEST_BYTES:
+            data, reparsed = build_bank(csv_path, previous=bank)
+            new_bank = self._install(csv_path, bank, lambda bank_path: write_atomic(bank_path, data))
+            detail = f"re-parsed {reparsed} of {len(new_bank)} rows"
+        else:
+            from bank_ingest import describe_problems, ingest_bank
+            reports = []
+            new_bank = self._install(csv_path, bank,
+                                     lambda bank_path: reports.append(ingest_bank(csv_path, bank_path, bank)))
+            detail = f"ingested {len(new_bank)} rows ({reports[-1].changed} new or changed)"
+            for line in describe_problems(reports[-1]):
+                print(f"question_bank: {csv_path}: {line}", file=sys.stderr)
+        elapsed = time.perf_counter() - started
+        if bank is not None:
+            print(f"question_bank: {csv_path} changed, version {bank.version} -> {new_bank.version}, "
+                  f"{detail} in {elapsed:.3f}s", file=sys.stderr)
+        elif elapsed >= 1:
+            print(f"question_bank: compiled {csv_path}, {detail} in {elapsed:.3f}s", file=sys.stderr)
+        return new_bank
+
+    def _install(self, csv_path, old_bank, write):
+        """Writes a new current bank with write(bank_path), keeping the old one as an earlier version."""
+        bank_path, fallback_path = self._bank_paths(csv_path)
+        try:
+            self._replace(bank_path, old_bank, write)
+        except OSError:
+            # Read-only checkout: compile into the temp directory instead
+            bank_path = fallback_path
+            self._replace(bank_path, old_bank, write)
+        new_bank = QuestionBank(bank_path)
+        with self._lock:
+            self._current[csv_path] = new_bank
+            if old_bank is not None:
+                self._keep_earlier(csv_path, old_bank)
+        return new_bank
+
+    def _replace(self, bank_path, old_bank, write):
+        """Writes bank_path with write(bank_path), first keeping the bank there as <name>.<version>.qbank."""
+        if old_bank is not None and os.path.exists(bank_path):
+            try:
+                self._archive(bank_path, old_bank.version)
+            except OSError as e:
+                print(f"question_bank: could not keep version {old_bank.version} of {bank_path}: {e}",
+                      file=sys.stderr)
+        write(bank_path)
+
+    def _archive(self, bank_path, version):
+        archive_bank(bank_path, version, self.versions_kept)
+
+    def _keep_earlier(self, csv_path, bank):
+        self._earlier[(csv_path, bank.version)] = bank
+        versions = [key for key in self._earlier if key[0] == csv_path]
+        for key in versions[:-self.versions_kept]:
+            self._earlier.pop(key).close()
+
+    def _open_earlier(self, csv_path, version):
+        bank = self._earlier.get((csv_path, version))
+        if bank is None:
+            for bank_path in self._bank_paths(csv_path):
+                bank = _open_valid(bank_path_for(bank_path, version))
+                if bank is not None:
+                    self._keep_earlier(csv_path, bank)
+                    break
+            else:
+                raise ValueError(f"Version {version} of the question bank '{csv_path}' is no longer available")
+        return bank
+
+    def refresh(self, csv_paths):
+        """Brings the banks of csv_paths up to date, reporting failures on stderr."""
+        for csv_path in csv_paths:
+            try:
+                self._refresh(csv_path)
+            except (OSError, KeyError, ValueError) as e:
+                print(f"question_bank: could not compile {csv_path}: {e!r}", file=sys.stderr)
+
+    def start_watching(self, csv_paths, interval=BANK_WATCH_INTERVAL):
+        """Checks csv_paths for changes every `interval` seconds from a daemon thread."""
+        csv_paths = list(csv_paths)
+
+        def run():
+            while True:
+                self.refresh(csv_paths)
+                time.sleep(interval)
+
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=run, name="question-bank-watcher", daemon=True)
+            self._watcher.start()
+
+
+# Shared by every caller of open_bank() in this process
+bank_manager = BankManager()
+
+
+def open_bank(csv_path, version=None):
+    """Returns the memory-mapped bank for csv_path (see BankManager.open)."""
+    return bank_manager.open(csv_path, version)
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or list(SUBJECT_FILES.values())
+    for path in paths:
+        bank = open_bank(path)
+        print(f"{path} -> {bank.path} (version {bank.version}, {len(bank)} questions, "
+              f"{os.path.getsize(bank.path)} bytes)")
@@ -1,26 +1,11 @@
-import pandas as pd
-import random
+from question_bank import format_option, open_bank
+from sampling import bank_sections, draw_ids, new_draw
 
 def load_questions(file_path):
-    """Loads quiz questions from a CSV file into a list of dictionaries."""
+    """Loads quiz questions from the compiled bank of a CSV file into a list of dictionaries."""
     try:
-        # --- THIS IS THE ONLY LINE THAT CHANGED ---
-        # Read the CSV file into a pandas DataFrame
-        df = pd.read_csv(file_path)
-        # --- END OF CHANGE ---
-
-        # The rest of the function is identical
-        questions = []
-        for index, row in df.iterrows():
-            # Ensure the 'Pilihan Ganda' column is treated as a string before splitting
-            options_list = [opt.strip() for opt in str(row['Pilihan Ganda']).split('\n')]
-            question_data = {
-                'question': row['Pertanyaan'],
-                'options': options_list,
-                'answer': str(row['Jawaban']).lower().strip()
-            }
-            questions.append(question_data)
-        return questions
+        # The bank is compiled from the CSV on first use and memory-mapped afterwards
+        return open_bank(file_path).to_list()
     except FileNotFoundError:
         print(f"Error: The file '{file_path}' was not found.")
         return []
@@ -28,37 +13,36 @@ def load_questions(file_path):
         print(f"An error occurred while reading the file: {e}")
         return []
 
-def run_quiz(questions, num_questions=None, randomize=True):
-    """Runs the quiz, asking a specified number of questions."""
+def run_quiz(questions, num_questions=None, randomize=True, stratify=False):
+    """Runs the quiz, asking a specified number of questions (spread over the chapters if stratify)."""
     if not questions:
         print("No questions to run the quiz.")
         return
 
-    if randomize:
-        random.shuffle(questions)
-
     if num_questions is None or num_questions > len(questions):
-        questions_to_ask = questions
-    else:
-        questions_to_ask = questions[:num_questions]
+        num_questions = len(questions)
+    draw = new_draw(num_questions, len(questions), randomize, stratify)
+    questions_to_ask = [questions[i] for i in draw_ids(draw, bank_sections(questions) if stratify else None)]
     
     score = 0
     print("\n--- Welcome to the Quiz! ---")
 
     for i, q_data in enumerate(questions_to_ask, 1):
         print(f"\nQuestion {i}: {q_data['question']}")
-        for option in q_data['options']:
-            print(f"  {option}")
+        for letter, text in q_data['options']:
+            print(f"  {format_option(letter, text)}")
         
         user_answer = ""
         while not user_answer:
             user_answer = input("Your answer (e.g., 'a', 'b', 'c', etc.): ").lower().strip()
 
-        if user_answer == q_data['answer']:
+        answer_index = q_data['answer_index']
+        correct_letter = q_data['options'][answer_index][0].lower() if answer_index >= 0 else ''
+        if user_answer == correct_letter:
             print("Correct! 🎉")
             score += 1
         else:
-            print(f"Sorry, the correct answer was '{q_data['answer']}'.")
+            print(f"Sorry, the correct answer was '{correct_letter}'.")
 
     print("\n--- Quiz Finished! ---")
     print(f"Your final score is: {score}/{len(questions_to_ask)}")
@@ -73,6 +57,8 @@ if __name__ == "__main__":
         try:
             num = int(input(f"How many questions do you want? (Max: {len(all_questions)}): "))
             is_random = input("Randomize questions? (yes/no): ").lower().strip() == 'yes'
-            run_quiz(all_questions, num_questions=num, randomize=is_random)
+            is_spread = is_random and len(bank_sections(all_questions)) > 1 and \
+                input("Spread questions evenly across chapters? (yes/no): ").lower().strip() == 'yes'
+            run_quiz(all_questions, num_questions=num, randomize=is_random, stratify=is_spread)
         except ValueError:
             print("Invalid number. Please enter an integer.")
\ No newline at end of file
@@ -1,27 +1,31 @@
 import streamlit as st
-import pandas as pd
+import streamlit.components.v1 as components
 import random
 import time
-from google.cloud import firestore
 from streamlit_local_storage import LocalStorage
-from googletrans import Translator
-from functools import lru_cache
+from collections import namedtuple
+from functools import partial, wraps
 import traceback
-import asyncio
-import nest_asyncio
-
-# Apply nest_asyncio to allow nested event loops in Streamlit
-nest_asyncio.apply()
+import secrets
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from question_bank import (SUBJECT_FILES, bank_manager, format_option, open_bank, question_from_legacy,
+                           split_option)
+from translation import (AVAILABLE_LANGUAGES, DEFAULT_LANGUAGE, BackgroundLoop, PrefetchJob,
+                         TranslationScheduler, apply_sidecar, load_sidecar, question_texts,
+                         rebuild_questions)
+from translation_cache import TranslationCache
+from storage import (DEFAULT_BACKEND, DEFAULT_SQLITE_PATH, DocumentExists, DocumentNotFound,
+                     FirestoreBackend, SQLiteBackend)
+from metrics import ADMIN_TOKEN, METRICS_FILE, MetricsRegistry
+from sampling import QuizDraw, bank_sections, draw_ids, new_draw
+from session_codec import decode_progress, decode_snapshot, encode_progress, encode_snapshot
+from session_memory import evict_lru, footprint
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # --- CONSTANTS ---
 # Save code generation
 SAVE_CODE_WORDS = ["APPLE", "BEAR", "CANDY", "DREAM", "EAGLE", "FROG", "GIANT", "HONEY", "IRIS", "JADE"]
 
-# CSV column names
-CSV_QUESTION_COL = 'Pertanyaan'
-CSV_OPTIONS_COL = 'Pilihan Ganda'
-CSV_ANSWER_COL = 'Jawaban'
-
 # Grade thresholds and messages
 GRADE_THRESHOLDS = {
     100.0: ("A", "Perfect score, congratulations! Kamu dapat nilai **A**"),
@@ -35,138 +39,248 @@ GRADE_THRESHOLDS = {
 }
 
 # Session state keys to save
+# Questions are not saved; they are drawn again from the question bank using 'quiz_draw'
+# (legacy sessions whose questions are missing from the bank save 'original_questions').
+# Neither is other derived data (translated_questions_cache, prefetch_job, reconcile_job): it is rebuilt on demand
+# ('question_ids' only exists in sessions resumed from saves older than format 4)
 STATE_KEYS_TO_SAVE = [
-    'session_id', 'selected_subject', 'questions', 'original_questions', 'translated_questions_cache',
+    'session_id', 'selected_subject', 'quiz_draw', 'question_ids',
     'current_question_index', 'score', 'auto_next',
     'answer_submitted', 'last_choice', 'scored', 'timer_enabled',
-    'show_timer', 'time_elapsed_before_pause', 'answer_history', 'language', 'previous_language',
-    'user_name'  # Added to persist user name
+    'show_timer', 'time_elapsed_before_pause', 'language', 'previous_language',
+    'user_name',  # Added to persist user name
+    'save_revision'
 ]
 
-# --- TRANSLATION CONSTANTS ---
-DEFAULT_LANGUAGE = "id"  # Indonesian as default (source language)
-
-AVAILABLE_LANGUAGES = {
-    "id": "🇮🇩 Bahasa Indonesia (Original)",
-    "en": "🇬🇧 English",
-    "es": "🇪🇸 Español",
-    "fr": "🇫🇷 Français",
-    "de": "🇩🇪 Deutsch",
-    "zh-cn": "🇨🇳 简体中文",
-    "ja": "🇯🇵 日本語",
-    "ko": "🇰🇷 한국어",
-    "ar": "🇸🇦 العربية",
-    "pt": "🇵🇹 Português",
-}
+# Keys that change while answering; only these are sent on an incremental autosave
+DELTA_STATE_KEYS = [
+    'current_question_index', 'score', 'auto_next', 'answer_submitted', 'last_choice',
+    'scored', 'time_elapsed_before_pause', 'language', 'previous_language', 'save_revision'
+]
+
+# Version of the saved session document layout (legacy documents have no 'format' field).
+# Version 2 kept the full question in every history entry; 3 stores AnswerRecords;
+# 4 stores the QuizDraw instead of the question IDs; 5 keeps the document in a
+# compressed 'snapshot' (see session_codec.py), with incremental autosaves as
+# plain fields on top of it. Documents also carry 'save_revision', a counter
+# bumped by every save, as a plain field (0 when missing).
+SESSION_FORMAT_VERSION = 5
+COMPATIBLE_FORMAT_VERSIONS = (2, 3, 4, 5)
+
+# Answers sent as incremental autosaves before the snapshot is rewritten
+SNAPSHOT_EVERY = 10
+
+# One answer_history entry: the bank ID of the question, the index of the chosen
+# option (-1 if unknown), whether it was correct and the elapsed time when it was
+# answered (milliseconds, None without the timer). The text comes from the bank.
+AnswerRecord = namedtuple('AnswerRecord', ['question_id', 'chosen_index', 'correct', 'elapsed_ms'])
+
+# Translation batching: simultaneous Google Translate calls and retries per text
+TRANSLATION_CONCURRENCY = 8
+TRANSLATION_MAX_RETRIES = 3
+
+# Lazy translation: translate the current question on demand, the next few in the
+# background and then the rest in chunks. When off, the whole quiz is translated up front.
+LAZY_TRANSLATION = True
+PREFETCH_QUESTIONS = 3
+PREFETCH_CHUNK_SIZE = 10
+
+# Memory budget for a session's translated quizzes (bytes). The active language always
+# stays; other languages are dropped, least recently used first, once the translations
+# no longer fit, and rebuilt from the sidecar and translation caches when the student
+# switches back. 0 keeps only the active language.
+SESSION_TRANSLATION_BUDGET = 0
+
+# How often a session re-measures its memory footprint for the metrics (seconds);
+# measuring walks the whole session state, a few milliseconds for a long quiz
+FOOTPRINT_INTERVAL = 30.0
+
+# Local-first resume: the browser keeps a signed copy of the last save under this
+# LocalStorage item (see session_codec.py). Resuming shows it straight away and
+# checks the copy in storage in the background; the fragment polling for that
+# check runs this often (seconds), and answering waits for it at most RECONCILE_WAIT.
+LOCAL_PROGRESS_ITEM = 'progress'
+RECONCILE_POLL_INTERVAL = 1.0
+RECONCILE_WAIT = 2.0
+
+# With Firestore, autosaves, feedback and question reports are written in batches this often (seconds)
+WRITE_FLUSH_INTERVAL = 2.0
+
+# With Auto-Next on, how long the answer feedback stays up (seconds). The browser
+# schedules the rerun that moves on, so no server thread waits in the meantime.
+AUTO_NEXT_DELAY = 1.5
+
+# Browser-side timer: counts up from the elapsed time the server rendered it with,
+# so the display ticks without rerunning the script every second.
+LIVE_TIMER_HTML = """
+<div style="font-family: 'Source Sans Pro', sans-serif; color: rgb(49, 51, 63);">
+  <div style="font-size: 14px;">{label}</div>
+  <div id="timer" style="font-size: 2.25rem; line-height: 1.4;">{initial}</div>
+</div>
+<script>
+  const startedAt = Date.now() - {elapsed_ms};
+  const timer = document.getElementById("timer");
+  const pad = (n) => String(n).padStart(2, "0");
+  setInterval(() => {{
+    const secs = Math.floor((Date.now() - startedAt) / 1000);
+    timer.textContent = pad(Math.floor(secs / 60)) + ":" + pad(secs % 60);
+  }}, 1000);
+</script>
+"""
 
 # --- Initialise Local Storage ---
 localS = LocalStorage()
 
+# --- METRICS ---
+@st.cache_resource
+def get_metrics():
+    """Initialize the timing spans and counters shared by every session on this server (see metrics.py)."""
+    metrics = MetricsRegistry()
+    if METRICS_FILE:
+        metrics.start_textfile_writer(METRICS_FILE)
+    return metrics
+
+def session_key():
+    """Returns the ID of the browser session running this script, or None outside a script run."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else None
+
+def timed(span_name):
+    """Decorator that records every call as a metrics span, for the server and this session."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_metrics().span(span_name, session_key()):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def is_admin():
+    """True if the page was opened with ?admin=<QUIZ_ADMIN_TOKEN>."""
+    token = st.query_params.get('admin')
+    return bool(ADMIN_TOKEN and token and secrets.compare_digest(token, ADMIN_TOKEN))
+
 # --- TRANSLATION FUNCTIONS (ASYNC OPTIMIZED) ---
 @st.cache_resource
 def get_translator():
     """Initialize and cache the Google Translator instance."""
+    # Imported here so sessions that never translate don't pay for it
+    from googletrans import Translator
     return Translator()
 
-async def translate_text_async(translator, text, src_lang, dest_lang):
-    """Async function to translate a single text."""
-    try:
-        result = await translator.translate(text, src=src_lang, dest=dest_lang)
-        return result.text if result and hasattr(result, 'text') and result.text else text
-    except Exception:
-        # Return original text on error
-        return text
+@st.cache_resource
+def get_translation_cache():
+    """Initialize the translation cache shared by every session on this server."""
+    return TranslationCache()
 
-async def translate_batch_async(translator, texts, src_lang, dest_lang):
-    """Async function to translate multiple texts concurrently."""
-    # Create tasks for all translations
-    tasks = [translate_text_async(translator, text, src_lang, dest_lang) for text in texts]
-    
-    # Execute all translations concurrently
-    results = await asyncio.gather(*tasks)
+@st.cache_resource
+def get_translation_loop():
+    """Start the event loop thread that runs all translation work on this server."""
+    return BackgroundLoop(name="translation-loop")
+
+async def translate_text_async(translator, cache, text, src_lang, dest_lang):
+    """
+    Async function to translate a single text, checking the shared cache first.
+    Raises on failure so the scheduler can retry just this text.
+    """
+    cached = cache.get(text, dest_lang)
+    if cached is not None:
+        return cached
+    result = await translator.translate(text, src=src_lang, dest=dest_lang)
+    if not (result and hasattr(result, 'text') and result.text):
+        raise ValueError("Empty translation result")
+    cache.put(text, dest_lang, result.text)
+    return result.text
+
+@st.cache_resource
+def get_translation_scheduler():
+    """Initialize the scheduler that limits, deduplicates and retries translation calls."""
+    scheduler = TranslationScheduler(
+        partial(translate_text_async, get_translator(), get_translation_cache()),
+        max_concurrency=TRANSLATION_CONCURRENCY,
+        max_retries=TRANSLATION_MAX_RETRIES
+    )
+    get_metrics().add_gauges('translation', scheduler.stats.snapshot)
+    return scheduler
+
+async def translate_batch_async(cache, scheduler, texts, src_lang, dest_lang):
+    """
+    Async function to translate multiple texts through the scheduler.
+    Texts that could not be translated come back as None.
+    """
+    # Cached texts don't need a slot in the scheduler
+    results = [cache.get(text, dest_lang) for text in texts]
+    missing = [text for text, result in zip(texts, results) if result is None]
+    if missing:
+        translated = iter(await scheduler.translate_many(missing, src_lang, dest_lang))
+        results = [result if result is not None else next(translated) for result in results]
     return results
 
-def translate_questions_smart(questions, target_lang):
+def bind_translate_texts(target_lang):
+    """
+    Returns a blocking translate(texts) into target_lang that can be called from any thread.
+    The work runs on the shared translation loop, and identical requests that are
+    already in flight (same texts and language) share one job.
+    """
+    loop = get_translation_loop()
+    cache = get_translation_cache()
+    scheduler = get_translation_scheduler()
+    
+    def translate(texts):
+        job = loop.submit_shared(
+            (tuple(texts), target_lang),
+            lambda: translate_batch_async(cache, scheduler, list(texts), DEFAULT_LANGUAGE, target_lang)
+        )
+        return job.result()
+    return translate
+
+def translate_texts(texts, target_lang):
+    """Translates texts from Indonesian, returning None for any text that failed."""
+    return bind_translate_texts(target_lang)(texts)
+
+@timed('translate_questions_smart')
+def translate_questions_smart(questions, target_lang, use_session_cache=True):
     """
     Translates questions ONLY if target language is different from Indonesian.
     Uses async batch translation for maximum efficiency.
     Returns original questions if target is Indonesian.
+    With use_session_cache=False, the result is neither looked up in nor stored
+    in the session's translation cache (used when translating part of a quiz).
     """
     if target_lang == "id":
         return questions
     
     # Check if we already have this translation cached
     cache_key = f"translated_{target_lang}"
-    if cache_key in st.session_state.get('translated_questions_cache', {}):
+    if use_session_cache and cached_translation(target_lang) is not None:
         return st.session_state.translated_questions_cache[cache_key]
     
     try:
-        translator = get_translator()
-        
         # Collect all texts to translate
-        all_texts = []
-        for q in questions:
-            all_texts.append(q['question'])
-            all_texts.extend(q['options'])
+        all_texts = question_texts(questions)
         
-        # Async batch translate with retry logic
+        # Async batch translate; the scheduler retries failed texts individually
         with st.spinner(f"🔄 Translating {len(questions)} questions to {AVAILABLE_LANGUAGES[target_lang]}..."):
-            max_retries = 3
-            translated_texts = None
-            
-            for attempt in range(max_retries):
-                try:
-                    # Run async translation
-                    translated_texts = asyncio.run(translate_batch_async(
-                        translator, all_texts, 'id', target_lang
-                    ))
-                    
-                    # Verify we got all results
-                    if translated_texts and len(translated_texts) == len(all_texts):
-                        # Check if any translations failed (returned original text)
-                        success_count = sum(1 for orig, trans in zip(all_texts, translated_texts) if orig != trans)
-                        
-                        if success_count > 0:
-                            # At least some translations succeeded
-                            break
-                        else:
-                            # All translations returned original text (likely API issue)
-                            raise ValueError("No texts were translated")
-                    else:
-                        raise ValueError("Incomplete translation results")
-                        
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        st.warning(f"⚠️ Translation attempt {attempt + 1} failed: {str(e)[:100]}. Retrying...")
-                        time.sleep(1)
-                        # Get a fresh translator instance from cache
-                        translator = get_translator()
-                    else:
-                        st.error(f"❌ Translation failed after {max_retries} attempts: {str(e)[:100]}")
-                        st.info("💡 Tip: The Google Translate API can be unstable. Try refreshing or wait a moment.")
-                        return questions
-            
-            if not translated_texts or len(translated_texts) != len(all_texts):
-                st.error("❌ Translation failed. Using Indonesian.")
-                return questions
+            translated_texts = translate_texts(all_texts, target_lang)
+        
+        failed_count = sum(1 for text in translated_texts if text is None)
+        if failed_count == len(all_texts):
+            st.error("❌ Translation failed. Using Indonesian.")
+            st.info("💡 Tip: The Google Translate API can be unstable. Try refreshing or wait a moment.")
+            return questions
+        if failed_count:
+            st.warning(f"⚠️ {failed_count} of {len(all_texts)} texts could not be translated and are shown in Indonesian.")
+            translated_texts = [trans if trans is not None else orig for orig, trans in zip(all_texts, translated_texts)]
         
         # Reconstruct questions
-        translated_questions = []
-        idx = 0
-        for q in questions:
-            num_options = len(q['options'])
-            translated_q = {
-                'question': translated_texts[idx],
-                'options': translated_texts[idx+1:idx+1+num_options],
-                'answer': q['answer']  # Keep answer letter same
-            }
-            translated_questions.append(translated_q)
-            idx += 1 + num_options
+        translated_questions = rebuild_questions(questions, translated_texts)
         
         # Cache the translation
-        if 'translated_questions_cache' not in st.session_state:
-            st.session_state.translated_questions_cache = {}
-        st.session_state.translated_questions_cache[cache_key] = translated_questions
+        if use_session_cache:
+            if 'translated_questions_cache' not in st.session_state:
+                st.session_state.translated_questions_cache = {}
+            st.session_state.translated_questions_cache[cache_key] = translated_questions
+            evict_translations()
         
         st.success(f"✅ Successfully translated {len(questions)} questions!")
         
@@ -178,10 +292,94 @@ def translate_questions_smart(questions, target_lang):
         st.info("💡 Tip: Try selecting a different language or refresh the page.")
         return questions
 
+def cached_translation(lang):
+    """Returns the session's translated quiz for lang (None if not cached), marking it most recently used."""
+    cache = st.session_state.get('translated_questions_cache', {})
+    cache_key = f"translated_{lang}"
+    if cache_key not in cache:
+        return None
+    cache[cache_key] = cache.pop(cache_key)
+    return cache[cache_key]
+
+def evict_translations():
+    """Drops cached translations of inactive languages until they fit in SESSION_TRANSLATION_BUDGET."""
+    cache = st.session_state.get('translated_questions_cache')
+    active_key = f"translated_{st.session_state.get('language', DEFAULT_LANGUAGE)}"
+    if not cache or list(cache) == [active_key]:
+        return
+    _, evicted = evict_lru(cache, SESSION_TRANSLATION_BUDGET, keep=active_key,
+                           shared=st.session_state.get('original_questions', ()))
+    if evicted:
+        get_metrics().inc('translations_evicted', session_key(), len(evicted))
+
+def session_footprint():
+    """Returns {key: bytes} of this session's state, not counting the questions shared with other sessions."""
+    return footprint(st.session_state.to_dict(), shared=st.session_state.get('original_questions', ()))
+
+@st.cache_resource
+def get_prefetch_executor():
+    """Initialize the worker threads that translate questions ahead of the student."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="translation-prefetch")
+
+def start_translation_prefetch(target_lang):
+    """Starts translating the untranslated questions after the current one in the background."""
+    old_job = st.session_state.get('prefetch_job')
+    if old_job is not None:
+        old_job.cancel()
+    
+    translated = st.session_state.translated_questions_cache[f"translated_{target_lang}"]
+    current = st.session_state.get('current_question_index', 0)
+    pending = [(i, st.session_state.original_questions[i])
+               for i in range(current + 1, len(translated)) if translated[i] is None]
+    if not pending:
+        st.session_state.prefetch_job = None
+        return
+    
+    job = PrefetchJob(
+        bind_translate_texts(target_lang),
+        target_lang, pending, first_chunk=PREFETCH_QUESTIONS, chunk_size=PREFETCH_CHUNK_SIZE
+    )
+    get_prefetch_executor().submit(job.run)
+    st.session_state.prefetch_job = job
+
+def sync_translated_questions():
+    """
+    Merges questions translated in the background into the session and makes
+    sure the current question is translated, translating it now if needed.
+    Untranslated questions are shown in Indonesian until they are ready.
+    """
+    current_lang = st.session_state.get('language', DEFAULT_LANGUAGE)
+    cache_key = f"translated_{current_lang}"
+    translated = st.session_state.get('translated_questions_cache', {}).get(cache_key)
+    if current_lang == DEFAULT_LANGUAGE or translated is None:
+        return
+    
+    job = st.session_state.get('prefetch_job')
+    if job is not None and job.lang == current_lang:
+        for index, question in job.take_results().items():
+            translated[index] = question
+    
+    current = st.session_state.get('current_question_index', 0)
+    if current < len(translated) and translated[current] is None:
+        original = st.session_state.original_questions[current]
+        with st.spinner(f"🔄 Translating to {AVAILABLE_LANGUAGES[current_lang]}..."):
+            texts = translate_texts(question_texts([original]), current_lang)
+        if None in texts:
+            # Keep showing Indonesian for this question instead of retrying on every rerun
+            st.warning("⚠️ This question could not be translated and is shown in Indonesian.")
+            translated[current] = original
+        else:
+            translated[current] = rebuild_questions([original], texts)[0]
+    
+    st.session_state.questions = [
+        t if t is not None else o for t, o in zip(translated, st.session_state.original_questions)
+    ]
+
 def update_questions_for_language():
     """
     Updates displayed questions when language changes.
-    Only translates if necessary.
+    Uses the pre-translated sidecar bank where available; the remaining
+    questions are translated lazily, starting with the current one.
     """
     if 'original_questions' not in st.session_state:
         st.warning("⚠️ No original questions found. Please start a new quiz.")
@@ -192,12 +390,38 @@ def update_questions_for_language():
     # If Indonesian, use original
     if current_lang == 'id':
         st.session_state.questions = st.session_state.original_questions
-    else:
-        # Translate if needed
-        st.session_state.questions = translate_questions_smart(
+        if st.session_state.get('prefetch_job') is not None:
+            st.session_state.prefetch_job.cancel()
+        evict_translations()
+        return
+    
+    if 'translated_questions_cache' not in st.session_state:
+        st.session_state.translated_questions_cache = {}
+    cache_key = f"translated_{current_lang}"
+    if cached_translation(current_lang) is None:
+        csv_file = SUBJECT_FILES[st.session_state.selected_subject]
+        translated, missing = apply_sidecar(
             st.session_state.original_questions,
-            current_lang
+            load_sidecar(csv_file, current_lang)
         )
+        if missing and not LAZY_TRANSLATION:
+            # Translate if needed
+            live = translate_questions_smart(missing, current_lang, use_session_cache=False)
+            if live is missing:
+                # Live translation failed; show Indonesian and try again on the next switch
+                st.session_state.questions = st.session_state.original_questions
+                return
+            live = iter(live)
+            translated = [q if q is not None else next(live) for q in translated]
+        st.session_state.translated_questions_cache[cache_key] = translated
+    evict_translations()
+    
+    if LAZY_TRANSLATION:
+        # (Re)start the background translation unless it is already running for this language
+        job = st.session_state.get('prefetch_job')
+        if job is None or job.lang != current_lang or job.done:
+            start_translation_prefetch(current_lang)
+    sync_translated_questions()
 
 # --- Helper Functions ---
 def format_time(seconds):
@@ -205,6 +429,20 @@ def format_time(seconds):
     minutes, secs = divmod(int(seconds), 60)
     return f"{minutes:02d}:{secs:02d}"
 
+def get_elapsed_time(session_state):
+    """Returns the total quiz time in seconds, including time before the last save."""
+    return session_state.time_elapsed_before_pause + (time.time() - session_state.start_time)
+
+def render_live_timer(label, elapsed_seconds):
+    """Shows a timer metric that keeps ticking in the browser."""
+    timer_html = LIVE_TIMER_HTML.format(label=label, initial=format_time(elapsed_seconds),
+                                        elapsed_ms=int(elapsed_seconds * 1000))
+    # st.iframe replaces components.html in newer Streamlit releases
+    if hasattr(st, 'iframe'):
+        st.iframe(timer_html, height=90)
+    else:
+        components.html(timer_html, height=90)
+
 def get_grade_message(score_percentage):
     """Returns grade letter and message based on score percentage."""
     for threshold in sorted(GRADE_THRESHOLDS.keys(), reverse=True):
@@ -214,18 +452,72 @@ def get_grade_message(score_percentage):
     # Fallback (should never reach here due to threshold 0)
     return "E", "Keep practicing!"
 
+def answer_record_from_saved(entry):
+    """Converts a saved history entry into an AnswerRecord, including older entries holding the full question."""
+    if not isinstance(entry, dict):
+        return AnswerRecord(*entry)
+    q_data = entry.get('question_data', {})
+    options = q_data.get('options', [])
+    choice = entry.get('user_choice')
+    elapsed = entry.get('elapsed')
+    return AnswerRecord(
+        q_data.get('id'),
+        options.index(choice) if choice in options else -1,
+        bool(entry.get('is_correct')),
+        None if elapsed is None else round(elapsed * 1000)
+    )
+
+def answered_questions(session_state):
+    """Yields (question, AnswerRecord) for each answered question, looking the question up by its ID."""
+    questions = session_state.questions
+    by_id = {q['id']: q for q in questions if q.get('id') is not None}
+    for i, record in enumerate(session_state.answer_history):
+        # Legacy questions have no ID; their history follows the question order
+        yield by_id.get(record.question_id, questions[i]), record
+
+def option_label(q_data, index):
+    """Returns option `index` of a question as display text like 'a. Foo', or "N/A"."""
+    if 0 <= index < len(q_data['options']):
+        return format_option(*q_data['options'][index])
+    return "N/A"
+
+def chosen_option(q_data, record):
+    """Returns the option the student picked."""
+    return option_label(q_data, record.chosen_index)
+
+def correct_option(q_data):
+    """Returns the correct option of a question."""
+    return option_label(q_data, q_data['answer_index'])
+
+def choice_index_from_saved(q_data, choice):
+    """Maps a saved last_choice to an option index; saves before format 3 hold the option text."""
+    if not isinstance(choice, str):
+        return choice
+    letter = split_option(choice)[0].lower()
+    return next((i for i, (l, _) in enumerate(q_data['options']) if l.lower() == letter), None)
+
 def restore_session_from_code(code, resume_timer=True):
     """
     Loads session state from Firestore and updates st.session_state.
     Returns True if successful, False otherwise.
     """
-    state_data = load_state(code)
+    return apply_restored_state(load_state(code), resume_timer)
+
+def apply_restored_state(state_data, resume_timer=True):
+    """Replaces st.session_state with a loaded session state; returns False if there is none."""
     if state_data:
         st.session_state.clear()
         st.session_state.update(state_data)
         # If loading an old save file, ensure answer_history exists
         if 'answer_history' not in st.session_state:
             st.session_state.answer_history = []
+        # Go straight back to the quiz screen
+        st.session_state.subject_chosen = True
+        st.session_state.quiz_started = True
+        # Compact saves only hold the question IDs, so rebuild the displayed questions
+        if 'questions' not in st.session_state:
+            st.session_state.translated_questions_cache = {}
+            update_questions_for_language()
         # Reset the start time to now to resume the timer
         if resume_timer and st.session_state.get('timer_enabled', False):
             st.session_state.start_time = time.time()
@@ -233,9 +525,12 @@ def restore_session_from_code(code, resume_timer=True):
     return False
 
 # --- Firestore Connection ---
+# The client library is imported and the client created on first use, so the
+# subject selection screen renders without waiting for either.
 @st.cache_resource
 def get_db_connection():
     """Establishes a connection to the Firestore database."""
+    from google.cloud import firestore
     # Authenticate to Firestore with the credentials
     # cred = service_account.Credentials.from_service_account_info(key_dict)
     # db = firestore.Client(credentials=cred)
@@ -243,7 +538,16 @@ def get_db_connection():
     # we can often rely on its auto-discovery of credentials
     return firestore.Client.from_service_account_info(st.secrets["firestore"])
 
-db = get_db_connection()
+@st.cache_resource
+def get_storage():
+    """Returns the storage backend for sessions, feedback and reports (see storage.py)."""
+    if DEFAULT_BACKEND == 'sqlite':
+        storage = SQLiteBackend(DEFAULT_SQLITE_PATH)
+    else:
+        storage = FirestoreBackend(get_db_connection(), flush_interval=WRITE_FLUSH_INTERVAL)
+    get_metrics().add_gauges('storage', storage.stats)
+    return storage
+
 # --- Local Storage Synchronization ---
 # Use st.session_state as the single source of truth for what should be in the browser
 if 'session_id' not in st.session_state:
@@ -279,64 +583,315 @@ def generate_save_code(user_name=None):
     
     return f"{clean_name}-{random_num}"
 
-def check_code_exists(code):
-    """Check if a save code already exists in Firestore."""
-    try:
-        # Use the cached db connection instead of creating a new one
-        doc_ref = db.collection('quiz_sessions').document(code)
-        doc = doc_ref.get()
-        return doc.exists
-    except Exception:
-        # If Firestore check fails, assume code doesn't exist
-        return False
+def generate_fallback_save_code(user_name=None):
+    """Generates a save code with a high-entropy suffix, used when short codes keep colliding."""
+    clean_name = ''.join(c for c in (user_name or '') if c.isalnum()).upper()[:15]
+    prefix = clean_name or f"{random.choice(SAVE_CODE_WORDS)}-{random.choice(SAVE_CODE_WORDS)}"
+    return f"{prefix}-{secrets.token_hex(4).upper()}"
 
-def generate_unique_save_code(user_name=None):
-    """Generate a unique save code that doesn't exist in Firestore."""
-    max_attempts = 10
-    for _ in range(max_attempts):
-        code = generate_save_code(user_name)
-        if not check_code_exists(code):
+@timed('allocate_save_code')
+def allocate_save_code(user_name=None, document=None):
+    """
+    Reserves an unused save code by creating its session document, which fails
+    if the code is taken, so each attempt is a single round trip with no read.
+    The document holds `document`, or a placeholder until the first save.
+    """
+    storage = get_storage()
+    if document is None:
+        document = {'format': SESSION_FORMAT_VERSION, 'reserved_at': storage.timestamp()}
+    max_attempts = 5
+    for attempt in range(max_attempts + 1):
+        if attempt < max_attempts:
+            code = generate_save_code(user_name)
+        else:
+            code = generate_fallback_save_code(user_name)
+        try:
+            storage.create('quiz_sessions', code, document)
             return code
-    
-    # If we can't find a unique code after max_attempts, append timestamp
-    if user_name:
-        clean_name = ''.join(c for c in user_name if c.isalnum()).upper()[:15]
-        timestamp = int(time.time()) % 100000  # Last 5 digits of timestamp
-        return f"{clean_name}-{timestamp}"
-    else:
-        return f"{random.choice(SAVE_CODE_WORDS)}-{random.choice(SAVE_CODE_WORDS)}-{random.randint(10, 99)}"
+        except DocumentExists:
+            get_metrics().inc('save_code_retries', session_key())
+            continue
+    raise RuntimeError("Could not allocate a save code")
+
+def history_field(index):
+    """Returns the field name of an answer history entry in a saved session document."""
+    return f"q{index}"
 
-def save_state(code, session_state):
-    """Saves the essential quiz state to Firestore, filtering out widget keys."""
-    # If the timer is running, "freeze" the elapsed time before saving.
+def freeze_elapsed_time(session_state):
+    """If the timer is running, "freeze" the elapsed time before saving."""
     if session_state.get('timer_enabled', False):
         current_session_time = time.time() - session_state.start_time
         session_state.time_elapsed_before_pause += current_session_time
         session_state.start_time = time.time()
-    
+
+def build_state_snapshot(session_state):
+    """Builds the saved session state: the keys to persist plus the answer history."""
     # Create a new, clean dictionary containing only the keys we want to persist.
     state_to_save = {key: session_state[key] for key in STATE_KEYS_TO_SAVE if key in session_state}
+    if 'quiz_draw' not in session_state and 'question_ids' not in session_state:
+        # A legacy session whose questions are not in the bank keeps them in its saves
+        state_to_save['original_questions'] = list(session_state.get('original_questions', []))
+    history = session_state.get('answer_history', [])
+    state_to_save['history'] = {history_field(i): entry for i, entry in enumerate(history)}
+    return state_to_save
+
+def saved_state(session_state):
+    """Copies what build_state_document() reads, so a queued write can build the document later in another thread."""
+    state = {key: session_state[key] for key in (*STATE_KEYS_TO_SAVE, 'original_questions') if key in session_state}
+    state['answer_history'] = list(session_state.get('answer_history', []))
+    return state
+
+def build_state_document(session_state):
+    """Builds the full saved session document, holding the state as one compressed snapshot."""
+    return {'format': SESSION_FORMAT_VERSION, 'snapshot': encode_snapshot(build_state_snapshot(session_state)),
+            'save_revision': session_state.get('save_revision', 0)}
 
-    # Save the cleaned dictionary to Firestore.
-    doc_ref = db.collection("quiz_sessions").document(code)
-    doc_ref.set(state_to_save)
+@timed('save_state')
+def save_state(code, session_state, incremental=False):
+    """
+    Saves the essential quiz state to storage, filtering out widget keys.
+    With incremental=True, a session already saved under this code only sends
+    the progress fields and the answer history entries added since the last save,
+    until SNAPSHOT_EVERY answers have piled up next to the snapshot.
+    """
+    freeze_elapsed_time(session_state)
+    session_state.save_revision = session_state.get('save_revision', 0) + 1
+    
+    storage = get_storage()
+    history = session_state.get('answer_history', [])
+    
+    if incremental and session_state.get('autosave_code') == code \
+            and len(history) - session_state.get('autosave_snapshot_len', 0) < SNAPSHOT_EVERY:
+        saved_len = session_state.get('autosave_history_len', 0)
+        delta = {key: session_state[key] for key in DELTA_STATE_KEYS if key in session_state}
+        for i in range(saved_len, len(history)):
+            delta[f"history.{history_field(i)}"] = history[i]
+        try:
+            storage.update("quiz_sessions", code, delta,
+                           fallback=partial(build_state_document, saved_state(session_state)))
+        except DocumentNotFound:
+            # The document is gone (deleted from storage): save the session in full instead
+            pass
+        else:
+            session_state.autosave_history_len = len(history)
+            return
     
+    # Save the cleaned dictionary to storage, replacing any incremental fields
+    storage.set("quiz_sessions", code, build_state_document(session_state))
+    if incremental:
+        session_state.autosave_code = code
+        session_state.autosave_history_len = len(history)
+        session_state.autosave_snapshot_len = len(history)
+    
+def upgrade_last_choice(state_data):
+    """Turns a last_choice saved as option text into the option index."""
+    questions = state_data.get('original_questions') or state_data.get('questions') or []
+    current = state_data.get('current_question_index', 0)
+    if isinstance(state_data.get('last_choice'), str) and current < len(questions):
+        state_data['last_choice'] = choice_index_from_saved(questions[current], state_data['last_choice'])
+
+def legacy_question_ids(subject, questions):
+    """Finds legacy questions, which have no ID, in the subject's current bank by their text; None if any is missing."""
+    try:
+        bank_questions = open_bank(SUBJECT_FILES[subject]).questions()
+    except (KeyError, OSError, ValueError):
+        return None
+    by_text = {}
+    for q in bank_questions:
+        by_text.setdefault(q['question'], []).append(q)
+    ids = []
+    for q in questions:
+        # Of questions with the same text, take the one with the same options
+        matches = [m for m in by_text.get(q['question'], ()) if [tuple(opt) for opt in q['options']] == m['options']]
+        if not matches:
+            return None
+        by_text[q['question']].remove(matches[0])
+        ids.append(matches[0]['id'])
+    return ids
+
+def upgrade_legacy_questions(state_data):
+    """
+    Links the questions of a legacy session to the bank, so its saves can hold
+    'question_ids' like other sessions. Questions missing from the bank stay in
+    'original_questions', which is then saved with the session.
+    """
+    ids = legacy_question_ids(state_data.get('selected_subject'), state_data['original_questions'])
+    if ids is None:
+        return
+    state_data['question_ids'] = ids
+    state_data['original_questions'] = questions_from_ids(state_data['selected_subject'], ids)
+    # The history follows the question order
+    state_data['answer_history'] = [
+        record._replace(question_id=ids[i]) if record.question_id is None and i < len(ids) else record
+        for i, record in enumerate(state_data['answer_history'])
+    ]
+    # Rebuilt with the IDs, in the session's language
+    state_data.pop('questions', None)
+
+@timed('load_state')
 def load_state(code):
-    """Loads a session state from Firestore."""
-    doc_ref = db.collection("quiz_sessions").document(code)
-    doc = doc_ref.get()
-    if doc.exists:
-        return doc.to_dict()
-    else:
+    """Loads a session state from storage."""
+    storage = get_storage()
+    # Make sure autosaves still waiting in this process are read back
+    storage.flush(timeout=5)
+    state_data = storage.get("quiz_sessions", code)
+    if state_data is None:
+        return None
+    return state_from_document(code, state_data)
+
+def state_from_document(code, state_data):
+    """Turns a saved session document into session state, or None if it cannot be resumed."""
+    if state_data.pop('format', None) not in COMPATIBLE_FORMAT_VERSIONS:
+        # Legacy document holding the full questions
+        state_data['answer_history'] = [answer_record_from_saved(entry)
+                                         for entry in state_data.get('answer_history', [])]
+        for key in ('questions', 'original_questions'):
+            if key in state_data:
+                state_data[key] = [question_from_legacy(q) for q in state_data[key]]
+        state_data.setdefault('original_questions', state_data.get('questions', []))
+        upgrade_last_choice(state_data)
+        upgrade_legacy_questions(state_data)
+        return state_data
+    
+    snapshot_len = 0
+    if 'snapshot' in state_data:
+        try:
+            snapshot = decode_snapshot(state_data.pop('snapshot'))
+        except ValueError:
+            return None
+        # Fields from incremental autosaves are newer than the snapshot
+        snapshot_len = len(snapshot.get('history', {}))
+        snapshot.setdefault('history', {}).update(state_data.pop('history', {}))
+        snapshot.update(state_data)
+        state_data = snapshot
+    
+    # Rebuild the answer history list and the questions from the bank
+    history = state_data.pop('history', {})
+    state_data['answer_history'] = [answer_record_from_saved(history[history_field(i)])
+                                     for i in range(len(history))]
+    try:
+        subject = state_data['selected_subject']
+        if 'question_ids' in state_data:
+            state_data['original_questions'] = questions_from_ids(subject, state_data['question_ids'])
+        elif 'original_questions' in state_data:
+            # A legacy session whose questions are not in the bank (see upgrade_legacy_questions)
+            state_data['original_questions'] = [{**q, 'options': [tuple(opt) for opt in q['options']]}
+                                                for q in state_data['original_questions']]
+        else:
+            state_data['quiz_draw'] = QuizDraw(*state_data['quiz_draw'])
+            state_data['original_questions'] = quiz_questions(SUBJECT_FILES[subject], state_data['quiz_draw'])
+    except (KeyError, IndexError, TypeError, ValueError, FileNotFoundError):
+        return None
+    upgrade_last_choice(state_data)
+    # Continue sending incremental autosaves to this document
+    state_data['autosave_code'] = code
+    state_data['autosave_history_len'] = len(history)
+    state_data['autosave_snapshot_len'] = snapshot_len
+    return state_data
+
+# --- Local-first resume ---
+def sync_local_progress():
+    """Copies the last save of this session to the browser's local storage, once per save."""
+    code = st.session_state.get('session_id')
+    revision = st.session_state.get('save_revision')
+    if not code or not revision or st.session_state.get('local_progress_revision') == revision:
+        return
+    snapshot = encode_snapshot(build_state_snapshot(st.session_state))
+    localS.setItem(LOCAL_PROGRESS_ITEM, encode_progress(code, revision, snapshot), key='set_progress')
+    st.session_state.local_progress_revision = revision
+
+def local_progress_state(code):
+    """Returns the session state of the progress copy in the browser if it is a valid one for `code`, or None."""
+    item = localS.getItem(LOCAL_PROGRESS_ITEM)
+    if not item:
+        return None
+    try:
+        saved_code, revision, snapshot = decode_progress(item)
+    except ValueError:
+        return None
+    if saved_code != code:
         return None
+    return state_from_document(code, {'format': SESSION_FORMAT_VERSION, 'snapshot': snapshot,
+                                      'save_revision': revision})
+
+@st.cache_resource
+def get_reconcile_executor():
+    """Initialize the worker threads that read saved sessions back for resumed sessions."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="resume-reconcile")
+
+def fetch_saved_document(storage, code):
+    """Reads a saved session document, after the autosaves still queued in this process."""
+    storage.flush(timeout=5)
+    return storage.get("quiz_sessions", code)
+
+def resume_last_session(code):
+    """
+    Resumes the session saved under `code`. With a valid progress copy in the
+    browser the quiz is shown from it straight away and the save in storage is
+    checked in the background (see reconcile_resume); otherwise the session is
+    loaded from storage. Returns True if successful.
+    """
+    state_data = local_progress_state(code)
+    if state_data is None:
+        get_metrics().inc('resume_from_storage', session_key())
+        return restore_session_from_code(code)
+    apply_restored_state(state_data)
+    st.session_state.local_progress_revision = st.session_state.get('save_revision')
+    get_metrics().inc('resume_from_browser', session_key())
+    st.session_state.reconcile_job = get_reconcile_executor().submit(fetch_saved_document, get_storage(), code)
+    return True
+
+def reconcile_resume(timeout=0):
+    """
+    Applies the background check of a session resumed from the browser, once
+    it is done (waiting up to `timeout` seconds). The save with the higher
+    revision wins: a newer one in storage, from another device, replaces the
+    session, and an older or missing one is overwritten with this session.
+    Returns True if the session was replaced.
+    """
+    job = st.session_state.get('reconcile_job')
+    if job is None:
+        return False
+    try:
+        document = job.result(timeout=timeout)
+    except FutureTimeoutError:
+        return False
+    except Exception:
+        # Storage is unreachable; keep going from the browser copy
+        get_metrics().inc('resume_check_failed', session_key())
+        st.session_state.reconcile_job = None
+        return False
+    st.session_state.reconcile_job = None
+    code = st.session_state.session_id
+    local_revision = st.session_state.get('save_revision', 0)
+    stored_revision = document.get('save_revision', 0) if document is not None else -1
+    if stored_revision > local_revision:
+        state_data = state_from_document(code, document)
+        if apply_restored_state(state_data):
+            st.session_state.session_id = code
+            get_metrics().inc('resume_replaced', session_key())
+            st.toast("Your quiz was updated to your latest save.")
+            return True
+    elif stored_revision < local_revision:
+        # In full: the save in storage may lack answers, or be gone
+        save_state(code, st.session_state)
+        get_metrics().inc('resume_resaved', session_key())
+    return False
+
+@st.fragment(run_every=RECONCILE_POLL_INTERVAL)
+def reconcile_poller():
+    """Reruns the app once the background check of a resumed session is done."""
+    job = st.session_state.get('reconcile_job')
+    if job is None or job.done():
+        st.rerun()
 
 def submit_general_feedback(feedback_text):
     """Saves general feedback to the 'general_feedback' collection."""
     if feedback_text: # Ensure feedback is not empty
-        doc_ref = db.collection("general_feedback").document()
-        doc_ref.set({
+        storage = get_storage()
+        storage.add("general_feedback", {
             "feedback": feedback_text,
-            "timestamp": firestore.SERVER_TIMESTAMP
+            "timestamp": storage.timestamp()
         })
         return True
     return False
@@ -344,12 +899,12 @@ def submit_general_feedback(feedback_text):
 def submit_question_report(subject, question, report_text):
     """Saves a report about a specific question."""
     if report_text: # Ensure report is not empty
-        doc_ref = db.collection("question_reports").document()
-        doc_ref.set({
+        storage = get_storage()
+        storage.add("question_reports", {
             "subject": subject,
             "question_text": question,
             "report": report_text,
-            "timestamp": firestore.SERVER_TIMESTAMP
+            "timestamp": storage.timestamp()
         })
         return True
     return False
@@ -378,57 +933,138 @@ def generate_report_content(session_state):
     
     # Detailed Review
     report_lines.extend(["", "---", "## Answer Review"])
-    for i, entry in enumerate(session_state.answer_history):
-        q_data = entry["question_data"]
+    for i, (q_data, record) in enumerate(answered_questions(session_state)):
         report_lines.append(f"\n### Question {i+1}: {q_data['question']}")
         
-        if entry['is_correct']:
-            report_lines.append(f"- ✓ **Your Answer**: {entry['user_choice']} (Correct)")
+        if record.correct:
+            report_lines.append(f"- ✓ **Your Answer**: {chosen_option(q_data, record)} (Correct)")
         else:
-            correct_char = q_data['answer']
-            correct_full = next((opt for opt in q_data['options'] if opt.lower().strip().startswith(correct_char)), "N/A")
-            report_lines.append(f"- ✗ **Your Answer**: {entry['user_choice']}")
-            report_lines.append(f"- **Correct Answer**: {correct_full}")
+            report_lines.append(f"- ✗ **Your Answer**: {chosen_option(q_data, record)}")
+            report_lines.append(f"- **Correct Answer**: {correct_option(q_data)}")
             
     return "\n".join(report_lines)
 
 # --- DICTIONARIES AND CONSTANTS (no changes) ---
-SUBJECT_FILES = {
-    "Manajemen dan Keberlanjutan (Mankeb)": "multichoice-uts-mankeb.csv",
-    "Pemasaran Strategik (Pastra)": "multichoice-uts-pastra.csv",
-    "Manajemen Rantai Pasok dan Logistik (MRPL)": "multichoice-uts-mrpl.csv",
-    "MRPL PPT Only": "multichoice-uts-mrpl-ppt-only.csv",
-    "MRPL Study Case": "multichoice-uts-mrpl-studycase.csv"
-}
 GITHUB_BASE_URL = "https://github.com/aaprasetyo289/quiz-app/blob/main/"
 
 # --- DATA LOADING (no changes) ---
-@st.cache_data
+@st.cache_resource
+def watch_question_banks():
+    """Starts recompiling the banks of changed CSV files in the background (see question_bank.py)."""
+    bank_manager.start_watching(SUBJECT_FILES.values())
+
+def current_bank_version(file_path):
+    """Returns the version of the up-to-date bank of a CSV file."""
+    return open_bank(file_path).version
+
+def get_shared_questions(file_path, version=None):
+    """
+    Returns the questions of a version of the compiled bank of a CSV file (the
+    current one by default) as a sequence that decodes each question once per
+    server, when it is first used. Every session shares the question dicts, so
+    they must not be modified. A session keeps the questions of the version it
+    started with.
+    """
+    return open_bank(file_path, version).questions()
+
+@timed('load_questions')
 def load_questions(file_path):
-    """Loads quiz questions from a CSV file into a list of dictionaries."""
+    """Returns the shared questions of the current version of a CSV file's bank."""
     try:
-        df = pd.read_csv(file_path)
-        df = df.dropna(subset=[CSV_QUESTION_COL, CSV_OPTIONS_COL, CSV_ANSWER_COL])
-        
-        # Use to_dict('records') for better performance than iterrows()
-        questions = []
-        for row in df.to_dict('records'):
-            options_list = [opt.strip() for opt in str(row[CSV_OPTIONS_COL]).split('\n')]
-            question_data = {
-                'question': row[CSV_QUESTION_COL],
-                'options': options_list,
-                'answer': str(row[CSV_ANSWER_COL]).lower().strip()
-            }
-            questions.append(question_data)
-        return questions
+        return get_shared_questions(file_path)
     except FileNotFoundError:
         st.error(f"Error: The file '{file_path}' was not found.")
-        return []
+        return ()
     except KeyError as e:
         st.error(f"Error: A required column is missing from the CSV file: {e}.")
-        return []
+        return ()
+
+def questions_from_ids(subject, question_ids):
+    """Looks up the questions of a saved quiz by ID in the current version of the subject's bank."""
+    bank = open_bank(SUBJECT_FILES[subject])
+    questions = bank.questions()
+    return [questions[bank.index_of(question_id)] for question_id in question_ids]
+
+@st.cache_resource(max_entries=2 * len(SUBJECT_FILES))
+def get_bank_sections(file_path, version):
+    """Groups the positions in a bank version by chapter, for stratified draws (see sampling.py)."""
+    return bank_sections(get_shared_questions(file_path, version))
+
+def quiz_questions(file_path, draw):
+    """
+    Returns the questions of a quiz, from the version of the CSV file's bank it
+    was drawn from. Raises ValueError if that version is no longer available.
+    """
+    bank = open_bank(file_path, draw.version)
+    questions = bank.questions()
+    if draw.total != len(questions):
+        raise ValueError(f"The question bank '{file_path}' has changed since this quiz was drawn")
+    sections = get_bank_sections(file_path, bank.version) if draw.stratify else None
+    return [questions[i] for i in draw_ids(draw, sections)]
+
+# --- QUIZ NAVIGATION ---
+def advance_to_next_question():
+    """Moves to the next question and autosaves; used as a callback, so no extra rerun is needed."""
+    # Don't save over a newer save of a session resumed from the browser
+    if reconcile_resume(timeout=RECONCILE_WAIT):
+        return
+    st.session_state.current_question_index += 1
+    st.session_state.answer_submitted = False
+    st.session_state.scored = False
+    st.session_state.recorded = False
+    st.session_state.pop('auto_next_due', None)
+    # Autosave (queued, so it doesn't hold up the next question)
+    if st.session_state.get('session_id'):
+        save_state(st.session_state.session_id, st.session_state, incremental=True)
+
+@st.fragment(run_every=AUTO_NEXT_DELAY)
+def auto_advance():
+    """Waits out AUTO_NEXT_DELAY on the browser's timed fragment rerun, then moves on."""
+    due = st.session_state.setdefault('auto_next_due', time.time() + AUTO_NEXT_DELAY)
+    # Allow for the browser timer firing a little early
+    if time.time() + 0.2 >= due:
+        advance_to_next_question()
+        st.rerun()
+    st.caption("⏭️ Moving to the next question...")
+
+# --- ADMIN ---
+def render_admin_panel():
+    """Sidebar panel with this session's counters and the server-wide metrics, for admins only."""
+    metrics = get_metrics()
+    with st.expander("📊 Metrics"):
+        counters, spans = metrics.session_snapshot(session_key())
+        st.write("**This session**")
+        st.write(", ".join(f"{name}: {value}" for name, value in sorted(counters.items())) or "No counters yet")
+        st.dataframe([{'span': name, 'calls': calls, 'total_ms': seconds * 1000}
+                      for name, (calls, seconds) in sorted(spans.items())], hide_index=True)
+        if st.session_state.get('translation_error'):
+            st.write(f"Last translation error: {st.session_state.translation_error}")
+        sizes = session_footprint()
+        st.write(f"Memory: {sum(sizes.values()) / 1024:.1f} KiB, not counting shared question banks")
+        st.dataframe([{'key': key, 'KiB': size / 1024}
+                      for key, size in sorted(sizes.items(), key=lambda item: -item[1])[:10]], hide_index=True)
+        
+        st.write("**Server**")
+        st.write(", ".join(f"{name}: {value}" for name, value in sorted(metrics.counters().items())))
+        st.dataframe(metrics.span_table(), hide_index=True)
+        memory = metrics.session_values('memory_bytes')
+        st.write(f"Session memory: {memory['sum'] / 1024:.1f} KiB over {memory['sessions']} sessions, "
+                 f"largest {memory['max'] / 1024:.1f} KiB")
+        st.write(f"Storage: {get_storage().stats()}")
+        st.write(f"Translation calls: {get_translation_scheduler().stats.summary()}")
+        st.write(f"Translation jobs: {get_translation_loop().submitted} run, {get_translation_loop().coalesced} coalesced")
+        st.download_button("Download metrics.prom", metrics.render(), file_name="metrics.prom",
+                           mime="text/plain")
 
 # --- APP LOGIC ---
+script_started = time.perf_counter()
+get_metrics().inc('reruns', session_key())
+watch_question_banks()
+if reconcile_resume():
+    st.rerun()
+if st.session_state.get('reconcile_job') is not None:
+    reconcile_poller()
+sync_local_progress()
 st.title("📚 Quiz App")
 
 # --- Initialize States ---
@@ -470,11 +1106,9 @@ if not st.session_state.subject_chosen:
         st.subheader("Resume Your Last Session?")
         st.write("Click this button to resume your last session.")
         if st.button("Yes, Resume My Last Autosaved Quiz"):
-            if restore_session_from_code(st.session_state.session_id):
+            if resume_last_session(st.session_state.session_id):
                 # Important: Restore the session_id after clearing
                 st.session_state.session_id = localS.getItem('session_id')
-                st.success("Resuming your last session...")
-                time.sleep(1)
                 st.rerun()
             else:
                 st.error("Could not find your saved session.")
@@ -532,6 +1166,9 @@ elif st.session_state.subject_chosen and not st.session_state.quiz_started:
         )
         
         randomize = st.checkbox("Randomise question order", value=True)
+        stratify = False
+        if randomize and len(get_bank_sections(csv_file, current_bank_version(csv_file))) > 1:
+            stratify = st.checkbox("Spread questions evenly across chapters", value=True)
         
         st.divider()
         st.subheader("⏱️ Timer Options")
@@ -541,17 +1178,20 @@ elif st.session_state.subject_chosen and not st.session_state.quiz_started:
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Start Quiz", type="primary"):
-                # Prepare questions for the quiz
-                if randomize:
-                    random.shuffle(all_questions)
+                # Draw the questions from the newest bank version; only the draw (seed,
+                # number of questions, bank version, ...) is saved
+                bank = open_bank(csv_file)
+                bank_size = len(bank)
+                quiz_draw = new_draw(min(num_questions, bank_size), bank_size, randomize, stratify, bank.version)
                 
-                # Generate unique save code with user's name
+                # Reserve a unique save code with user's name; the first autosave fills it in
                 user_name = st.session_state.get('user_name', '')
-                session_id = generate_unique_save_code(user_name if user_name else None)
+                session_id = allocate_save_code(user_name if user_name else None)
                 st.session_state.session_id = session_id
                 
-                # Store ORIGINAL questions (Indonesian)
-                st.session_state.original_questions = all_questions[:num_questions]
+                # Store the draw, and the ORIGINAL questions (Indonesian) as references to the shared bank
+                st.session_state.quiz_draw = quiz_draw
+                st.session_state.original_questions = quiz_questions(csv_file, quiz_draw)
                 
                 # Initialize translation cache
                 st.session_state.translated_questions_cache = {}
@@ -612,11 +1252,6 @@ elif st.session_state.quiz_started:
             new_lang = st.session_state.language_selector_widget
             old_lang = st.session_state.get('language', DEFAULT_LANGUAGE)
             
-            # Debug logging
-            st.session_state.debug_callback_fired = True
-            st.session_state.debug_new_lang = new_lang
-            st.session_state.debug_old_lang = old_lang
-            
             if new_lang != old_lang:
                 st.session_state.language = new_lang
                 st.session_state.translation_triggered = True
@@ -638,26 +1273,6 @@ elif st.session_state.quiz_started:
             label_visibility="collapsed"
         )
         
-        # Debug info
-        if 0 > 1:
-            with st.expander("🔍 Debug Info"):
-                st.write(f"Current language: {st.session_state.language}")
-                st.write(f"Selector widget value: {st.session_state.get('language_selector_widget', 'NOT SET')}")
-                st.write(f"Callback fired: {st.session_state.get('debug_callback_fired', False)}")
-                if st.session_state.get('debug_callback_fired', False):
-                    st.write(f"  - New lang in callback: {st.session_state.get('debug_new_lang', 'N/A')}")
-                    st.write(f"  - Old lang in callback: {st.session_state.get('debug_old_lang', 'N/A')}")
-                    st.write(f"  - Translation triggered: {st.session_state.get('translation_triggered', False)}")
-                    if st.session_state.get('translation_success') is not None:
-                        st.write(f"  - Translation success: {st.session_state.get('translation_success', False)}")
-                    if st.session_state.get('translation_error'):
-                        st.write(f"  - Translation error: {st.session_state.get('translation_error', 'None')}")
-                st.write(f"Has original_questions: {'original_questions' in st.session_state}")
-                st.write(f"Has questions: {'questions' in st.session_state}")
-                if 'questions' in st.session_state and len(st.session_state.questions) > 0:
-                    st.write(f"First question: {st.session_state.questions[0]['question'][:50]}...")
-                st.write(f"Cache keys: {list(st.session_state.get('translated_questions_cache', {}).keys())}")
-        
         if st.session_state.language != "id":
             st.caption("🤖 Powered by Google Translate")
         
@@ -674,11 +1289,12 @@ elif st.session_state.quiz_started:
             st.divider()
             st.header("💾 Save and Load")
             if st.button("Save Progress"):
-                # Generate unique save code with user's name
+                # Save under a new unique code with user's name, in a single write
                 user_name = st.session_state.get('user_name', '')
-                save_code = generate_unique_save_code(user_name if user_name else None)
+                freeze_elapsed_time(st.session_state)
+                save_code = allocate_save_code(user_name if user_name else None,
+                                               build_state_document(st.session_state))
                 
-                save_state(save_code, st.session_state)
                 st.info("Your progress has been saved!")
                 st.success(f"Your save code is: **{save_code}**")
                 st.warning("Copy this code to resume later.")
@@ -708,6 +1324,9 @@ elif st.session_state.quiz_started:
             else:
                 st.toast("Please enter some feedback before submitting.")
 
+    # Pick up questions translated in the background since the last rerun
+    sync_translated_questions()
+
     if st.session_state.current_question_index >= len(st.session_state.questions):
         st.header("🎉 Quiz Finished! 🎉")
         st.session_state.session_id = None
@@ -715,8 +1334,7 @@ elif st.session_state.quiz_started:
         if st.session_state.get('timer_enabled', False):
             # Calculate and store the final time only once
             if st.session_state.get('final_time_taken') is None:
-                current_session_time = time.time() - st.session_state.start_time
-                st.session_state.final_time_taken = st.session_state.time_elapsed_before_pause + current_session_time
+                st.session_state.final_time_taken = get_elapsed_time(st.session_state)
             
             # Format and display the final time
             formatted_time = format_time(st.session_state.final_time_taken)
@@ -753,49 +1371,22 @@ elif st.session_state.quiz_started:
             )
         st.divider()
         with st.expander("🧐 Review Your Answers"):
-            for i, entry in enumerate(st.session_state.answer_history):
-                q_data = entry["question_data"]
-                
+            for i, (q_data, record) in enumerate(answered_questions(st.session_state)):
                 st.subheader(f"Question {i+1}: {q_data['question']}")
 
-                if entry['is_correct']:
-                    st.success(f"✓ You correctly answered: {entry['user_choice']}")
+                if record.correct:
+                    st.success(f"✓ You correctly answered: {chosen_option(q_data, record)}")
                 else:
-                    # Find the full text of the correct answer
-                    correct_answer_char = q_data['answer']
-                    correct_answer_full = next(
-                        (opt for opt in q_data['options'] if opt.lower().strip().startswith(correct_answer_char)),
-                        "N/A"
-                    )
-                    
-                    st.error(f"✗ Your answer: {entry['user_choice']}")
-                    st.info(f"Correct answer: {correct_answer_full}")
+                    st.error(f"✗ Your answer: {chosen_option(q_data, record)}")
+                    st.info(f"Correct answer: {correct_option(q_data)}")
                 
                 st.divider()
     else:
         q_data = st.session_state.questions[st.session_state.current_question_index]
         st.write(f"Current Subject: {st.session_state.selected_subject}")
-        # Timer display and logic
-        if st.session_state.get('timer_enabled', False):
-            # Create a placeholder for the timer display
-            timer_placeholder = st.empty()
-
-            # Calculate remaining time only if the quiz is not finished
-            if st.session_state.current_question_index < len(st.session_state.questions):
-                # Time elapsed in the current active session
-                current_session_time = time.time() - st.session_state.start_time
-                # Total elapsed time including previous saved sessions
-                total_elapsed = st.session_state.time_elapsed_before_pause + current_session_time
-                
-                if st.session_state.show_timer:
-                    formatted_time = format_time(total_elapsed)
-                    timer_placeholder.metric("Time Elapsed", formatted_time)
-            else:
-                # When quiz is finished, display the final time
-                total_elapsed = st.session_state.time_elapsed_before_pause
-                if st.session_state.show_timer:
-                    formatted_time = format_time(total_elapsed)
-                    timer_placeholder.metric("Total Time Taken", formatted_time)
+        # Timer display: the browser does the ticking, the script only renders the starting point
+        if st.session_state.get('timer_enabled', False) and st.session_state.get('show_timer', False):
+            render_live_timer("Time Elapsed", get_elapsed_time(st.session_state))
         st.write(f"Question {st.session_state.current_question_index + 1}/{len(st.session_state.questions)}")
         questions_answered = st.session_state.current_question_index
         current_score = st.session_state.score
@@ -814,60 +1405,53 @@ elif st.session_state.quiz_started:
         # Display question and options (already translated if needed)
         st.header(q_data['question'])
 
-        user_choice = st.radio("Choose your answer:", q_data['options'], key=f"q_{st.session_state.current_question_index}", index=None, disabled=st.session_state.answer_submitted)
+        # The radio returns the index of the chosen option
+        user_choice = st.radio("Choose your answer:", range(len(q_data['options'])),
+                               format_func=lambda i: format_option(*q_data['options'][i]),
+                               key=f"q_{st.session_state.current_question_index}", index=None,
+                               disabled=st.session_state.answer_submitted)
 
         if not st.session_state.answer_submitted:
             if st.button("Submit Answer"):
-                if user_choice:
+                if user_choice is not None:
                     st.session_state.last_choice = user_choice
                     st.session_state.answer_submitted = True
+                    # The only place the clock is read while answering
+                    if st.session_state.get('timer_enabled', False):
+                        st.session_state.answer_elapsed = get_elapsed_time(st.session_state)
                     st.rerun()
                 else:
                     st.warning("Please select an answer.")
         else:
-            chosen_letter = st.session_state.last_choice.split('.')[0].lower().strip()
-            correct_answer = q_data['answer']
-            if chosen_letter == correct_answer:
+            is_correct = st.session_state.last_choice == q_data['answer_index']
+            if is_correct:
                 st.success("Correct! 🎉")
                 if 'scored' not in st.session_state or not st.session_state.scored:
                     st.session_state.score += 1
                     st.session_state.scored = True
             else:
-                st.error(f"Sorry, that's incorrect. The correct answer was '{correct_answer}'.")
+                answer_index = q_data['answer_index']
+                correct_letter = q_data['options'][answer_index][0].lower() if answer_index >= 0 else ''
+                st.error(f"Sorry, that's incorrect. The correct answer was '{correct_letter}'.")
                 st.session_state.scored = True
                 
             # Record the answer for the review screen, ensuring it's only recorded once
             if 'recorded' not in st.session_state or not st.session_state.recorded:
-                history_entry = {
-                    "question_data": q_data,
-                    "user_choice": st.session_state.last_choice,
-                    "is_correct": (chosen_letter == correct_answer)
-                }
+                elapsed = st.session_state.get('answer_elapsed')
+                history_entry = AnswerRecord(
+                    q_data.get('id'),
+                    st.session_state.last_choice if st.session_state.last_choice is not None else -1,
+                    is_correct,
+                    None if elapsed is None else round(elapsed * 1000)
+                )
                 st.session_state.answer_history.append(history_entry)
                 st.session_state.recorded = True
+                get_metrics().inc('answers', session_key())
             
             if st.session_state.auto_next:
-                time.sleep(1.5)
-                st.session_state.current_question_index += 1
-                st.session_state.answer_submitted = False
-                st.session_state.scored = False
-                st.session_state.recorded = False
-                # Autosave
-                if 'session_id' in st.session_state:
-                    save_state(st.session_state.session_id, st.session_state)
-                #    st.toast(f"Autosaved session: {st.session_state.session_id}", icon="💾")  
-                    st.rerun()
+                auto_advance()
             else:
-                if st.button("Next Question"):
-                    st.session_state.current_question_index += 1
-                    st.session_state.answer_submitted = False
-                    st.session_state.scored = False
-                    st.session_state.recorded = False
-                    # Autosave
-                if 'session_id' in st.session_state:
-                    save_state(st.session_state.session_id, st.session_state)
-                #    st.toast(f"Autosaved session: {st.session_state.session_id}", icon="💾")  
-                    st.rerun()
+                st.button("Next Question", on_click=advance_to_next_question)
         # --- Per-Question Report Expander ---
         st.divider()
         with st.expander("Report a problem with this question"):
@@ -880,9 +1464,13 @@ elif st.session_state.quiz_started:
                     st.toast("Report submitted. Thank you for helping improve the quiz! 👍")
                 else:
                     st.toast("Please describe the problem before submitting.")
-                    
-        if (st.session_state.get('timer_enabled', False) and
-        st.session_state.get('show_timer', False) and
-        st.session_state.current_question_index < len(st.session_state.questions)):    
-            time.sleep(1)
-            st.rerun()
\ No newline at end of file
+
+# --- METRICS AND ADMIN PANEL ---
+# Runs cut short by st.rerun() are not timed; the run that follows is
+if time.time() - st.session_state.get('footprint_measured_at', 0) >= FOOTPRINT_INTERVAL:
+    st.session_state.footprint_measured_at = time.time()
+    get_metrics().set_session_value('memory_bytes', session_key(), sum(session_footprint().values()))
+get_metrics().observe('script_run', time.perf_counter() - script_started, session_key())
+if is_admin():
+    with st.sidebar:
+        render_admin_panel()
@@ -0,0 +1,96 @@
+"""
+Reproducible question sampling.
+
+A quiz is defined by its QuizDraw: a seed, the number of questions k, the
+size and version of the bank it was drawn from and how the questions were
+picked. draw_ids() turns a draw into the same positions in that version of the
+bank on any server, in O(k) time and memory, so a saved session only needs to
+store the draw.
+
+Stratified draws spread the questions over the sections of a bank in
+proportion to their size. Sections are the chapters tagged at the end of the
+question text, like "(Chapter 2)" or "(Bab 2)"; untagged questions form a
+section of their own.
+"""
+import random
+import re
+from collections import namedtuple
+
+# seed: int, k: questions in the quiz, total: questions in the bank when drawn,
+# randomize: False takes the first k questions in bank order,
+# stratify: balance the questions over the bank's sections,
+# version: the bank version drawn from (None in draws saved before banks had versions)
+QuizDraw = namedtuple('QuizDraw', ['seed', 'k', 'total', 'randomize', 'stratify', 'version'],
+                      defaults=(None,))
+
+SECTION_PATTERN = re.compile(r'\((?:Chapter|Bab)\s*(\d+)\)\s*$', re.IGNORECASE)
+
+
+def _below(rng, n):
+    """Random int in [0, n). Built on random(), the only Random method whose output is fixed across Python versions."""
+    return int(rng.random() * n)
+
+
+def sample(rng, population, k):
+    """
+    Returns k distinct items of a sequence in random order. A Fisher-Yates
+    shuffle that records only the positions it swaps, so it costs O(k) even
+    for a range over a huge bank.
+    """
+    n = len(population)
+    if not 0 <= k <= n:
+        raise ValueError(f"cannot draw {k} of {n} questions")
+    swapped = {}
+    picked = []
+    for i in range(k):
+        j = i + _below(rng, n - i)
+        picked.append(population[swapped.get(j, j)])
+        swapped[j] = swapped.get(i, i)
+    return picked
+
+
+def section_of(question_text):
+    """Returns the chapter number a question is tagged with, or None."""
+    match = SECTION_PATTERN.search(question_text)
+    return int(match.group(1)) if match else None
+
+
+def bank_sections(questions):
+    """Groups the positions of questions by section, in order of first appearance."""
+    sections = {}
+    for i, q in enumerate(questions):
+        sections.setdefault(section_of(q['question']), []).append(i)
+    return list(sections.values())
+
+
+def allocate(sizes, k):
+    """Splits k questions over sections in proportion to their sizes (largest remainder method)."""
+    total = sum(sizes)
+    quotas = [k * size / total for size in sizes]
+    counts = [int(q) for q in quotas]
+    by_remainder = sorted(range(len(sizes)), key=lambda i: counts[i] - quotas[i])
+    for i in by_remainder[:k - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def new_draw(k, total, randomize=True, stratify=False, version=None):
+    """Returns the QuizDraw of a new quiz with a fresh random seed."""
+    return QuizDraw(random.getrandbits(32), k, total, randomize, stratify, version)
+
+
+def draw_ids(draw, sections=None):
+    """
+    Returns the positions in the bank of the questions of a draw. Stratified
+    draws need the bank's sections (see bank_sections); the sections are
+    interleaved at random.
+    """
+    if not draw.randomize:
+        return list(range(draw.k))
+    rng = random.Random(draw.seed)
+    if not draw.stratify or not sections or len(sections) < 2:
+        return sample(rng, range(draw.total), draw.k)
+    ids = []
+    for section, count in zip(sections, allocate([len(s) for s in sections], draw.k)):
+        ids.extend(sample(rng, section, count))
+    return sample(rng, ids, len(ids))
@@ -0,0 +1,74 @@
+"""
+Measuring and bounding what a session keeps in server memory.
+
+Streamlit holds the state of every open session in the server process, so the
+memory a worker needs is roughly its open sessions times their footprint.
+footprint() measures a session's state, leaving out objects the session only
+references from a shared structure (the question banks), which are paid for
+once per server. evict_lru() trims a dict of derived data, like the session's
+translated quizzes, to a byte budget.
+
+Sizes are what sys.getsizeof reports for the containers and the values in
+them, so they are estimates: strings also held by the translation cache or a
+sidecar file count for every session that uses them, and objects other than
+dicts, lists, tuples and sets count only their own size.
+"""
+import sys
+
+CONTAINERS = (dict, list, tuple, set, frozenset)
+
+
+def deep_sizeof(obj, seen):
+    """Bytes used by obj and the values in it, skipping objects whose id is in seen (and adding the rest)."""
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, CONTAINERS):
+            stack.extend(obj)
+    return size
+
+
+def shared_ids(shared):
+    """Returns the ids of the objects in `shared` and everything they hold, for deep_sizeof to skip."""
+    seen = set()
+    for obj in shared:
+        deep_sizeof(obj, seen)
+    return seen
+
+
+def footprint(state, shared=()):
+    """
+    Returns {key: bytes} for a session state mapping, not counting the objects in
+    `shared`. An object referenced from several keys counts for the first one only.
+    """
+    seen = shared_ids(shared)
+    return {key: deep_sizeof(value, seen) for key, value in state.items()}
+
+
+def evict_lru(cache, budget, keep=None, shared=()):
+    """
+    Deletes entries from an insertion-ordered dict, oldest first, until it fits
+    in `budget` bytes, but never the entry `keep`. Callers keep the dict in LRU
+    order by moving an entry to the end when they use it. Returns
+    (bytes still used, evicted keys).
+    """
+    seen = shared_ids(shared)
+    sizes = {key: deep_sizeof(value, seen) for key, value in cache.items()}
+    used = sum(sizes.values())
+    evicted = []
+    for key in list(cache):
+        if used <= budget:
+            break
+        if key != keep:
+            del cache[key]
+            used -= sizes[key]
+            evicted.append(key)
+    return used, evicted
@@ -0,0 +1,223 @@
+"""
+Storage backends for saved sessions, feedback and question reports.
+
+The app stores JSON-like documents (which may also hold bytes values) in
+named collections, the way Firestore does. A backend implements StorageBackend:
+
+    FirestoreBackend  Firestore, with writes batched by a WriteBehindQueue
+    SQLiteBackend     one SQLite file in WAL mode, for single-node deployments
+                      and as a local stand-in in load tests and benchmarks
+
+Set QUIZ_STORAGE_BACKEND=sqlite (and optionally QUIZ_SQLITE_PATH) to use SQLite.
+"""
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from write_behind import WriteBehindQueue, apply_update
+
+DEFAULT_BACKEND = os.environ.get('QUIZ_STORAGE_BACKEND', 'firestore')
+DEFAULT_SQLITE_PATH = os.environ.get('QUIZ_SQLITE_PATH', 'quiz_data.sqlite3')
+
+
+class DocumentExists(Exception):
+    """Raised by StorageBackend.create when the document already exists."""
+
+
+class DocumentNotFound(Exception):
+    """Raised by StorageBackend.update when there is no document to update."""
+
+
+class StorageBackend:
+    """
+    Document store used by the app. Field names passed to update() may be
+    dotted paths into nested maps, e.g. 'history.q3'.
+    """
+
+    def create(self, collection, doc_id, data):
+        """Stores a new document; raises DocumentExists if doc_id is taken."""
+        raise NotImplementedError
+
+    def get(self, collection, doc_id):
+        """Returns the document as a dict, or None if it does not exist."""
+        raise NotImplementedError
+
+    def set(self, collection, doc_id, data):
+        """Creates or replaces a document."""
+        raise NotImplementedError
+
+    def update(self, collection, doc_id, fields, fallback=None):
+        """
+        Changes some fields of an existing document; raises DocumentNotFound if
+        there is none. Backends that write later cannot raise it, and store
+        fallback(), a function returning the full document, instead.
+        """
+        raise NotImplementedError
+
+    def add(self, collection, data):
+        """Stores a document under a new random ID."""
+        raise NotImplementedError
+
+    def timestamp(self):
+        """Returns the value to store for 'now' in a document."""
+        raise NotImplementedError
+
+    def flush(self, timeout=None):
+        """Waits for writes that have been accepted but not stored yet."""
+
+    def stats(self):
+        """Returns backend counters for the debug panel."""
+        return {}
+
+    def close(self):
+        """Releases connections and background threads."""
+
+
+class FirestoreBackend(StorageBackend):
+    """Firestore documents; set/update/add go through a write-behind queue, create and get do not."""
+
+    def __init__(self, client, flush_interval=2.0):
+        self._client = client
+        self._writes = WriteBehindQueue(client, flush_interval=flush_interval)
+
+    def create(self, collection, doc_id, data):
+        from google.api_core.exceptions import AlreadyExists
+        try:
+            self._client.collection(collection).document(doc_id).create(data)
+        except AlreadyExists:
+            raise DocumentExists(f"{collection}/{doc_id}") from None
+
+    def get(self, collection, doc_id):
+        doc = self._client.collection(collection).document(doc_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def set(self, collection, doc_id, data):
+        self._writes.set(collection, doc_id, data)
+
+    def update(self, collection, doc_id, fields, fallback=None):
+        self._writes.update(collection, doc_id, fields, fallback)
+
+    def add(self, collection, data):
+        self._writes.set(collection, None, data)
+
+    def timestamp(self):
+        from google.cloud import firestore
+        return firestore.SERVER_TIMESTAMP
+
+    def flush(self, timeout=None):
+        self._writes.flush(timeout)
+
+    def stats(self):
+        return {'backend': 'firestore', **self._writes.stats()}
+
+    def close(self):
+        self._writes.close()
+
+
+def _json_default(value):
+    """Stores bytes in JSON as {"$bytes": <base64>}."""
+    if isinstance(value, bytes):
+        return {'$bytes': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_object_hook(obj):
+    if len(obj) == 1 and '$bytes' in obj:
+        return base64.b64decode(obj['$bytes'])
+    return obj
+
+
+class SQLiteBackend(StorageBackend):
+    """Documents as JSON text in one SQLite table, written synchronously; safe to share between threads."""
+
+    def __init__(self, db_path=DEFAULT_SQLITE_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " collection TEXT NOT NULL, doc_id TEXT NOT NULL, data TEXT NOT NULL,"
+            " PRIMARY KEY (collection, doc_id)) WITHOUT ROWID"
+        )
+        self._latencies = deque(maxlen=200)
+        self.reads = 0
+        self.writes = 0
+
+    @staticmethod
+    def _encode(data):
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+
+    @staticmethod
+    def _decode(text):
+        return json.loads(text, object_hook=_json_object_hook)
+
+    def _write(self, sql, params):
+        started = time.perf_counter()
+        with self._lock:
+            self._db.execute(sql, params)
+            self.writes += 1
+            self._latencies.append(time.perf_counter() - started)
+
+    def create(self, collection, doc_id, data):
+        try:
+            self._write("INSERT INTO documents (collection, doc_id, data) VALUES (?, ?, ?)",
+                        (collection, doc_id, self._encode(data)))
+        except sqlite3.IntegrityError:
+            raise DocumentExists(f"{collection}/{doc_id}") from None
+
+    def get(self, collection, doc_id):
+        with self._lock:
+            self.reads += 1
+            row = self._db.execute("SELECT data FROM documents WHERE collection = ? AND doc_id = ?",
+                                   (collection, doc_id)).fetchone()
+        return self._decode(row[0]) if row else None
+
+    def set(self, collection, doc_id, data):
+        self._write("INSERT OR REPLACE INTO documents (collection, doc_id, data) VALUES (?, ?, ?)",
+                    (collection, doc_id, self._encode(data)))
+
+    def update(self, collection, doc_id, fields, fallback=None):
+        started = time.perf_counter()
+        with self._lock:
+            # Read-modify-write under one write transaction
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT data FROM documents WHERE collection = ? AND doc_id = ?",
+                                       (collection, doc_id)).fetchone()
+                if row is None:
+                    raise DocumentNotFound(f"{collection}/{doc_id}")
+                document = apply_update(self._decode(row[0]), fields)
+                self._db.execute("UPDATE documents SET data = ? WHERE collection = ? AND doc_id = ?",
+                                 (self._encode(document), collection, doc_id))
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            self.writes += 1
+            self._latencies.append(time.perf_counter() - started)
+
+    def add(self, collection, data):
+        self.set(collection, os.urandom(10).hex(), data)
+
+    def timestamp(self):
+        return time.time()
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'backend': 'sqlite',
+                'reads': self.reads,
+                'writes': self.writes,
+                'p95_write_ms': latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,23 @@
+"""
+Shared setup: the app modules are imported from the repository root, and the
+app stores sessions in a throwaway SQLite database instead of Firestore.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Read by storage.py on import, so set before any test imports the app
+os.environ['QUIZ_STORAGE_BACKEND'] = 'sqlite'
+os.environ['QUIZ_SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='quiz-tests-'), 'quiz_data.sqlite3')
+
+
+@pytest.fixture
+def in_repo(monkeypatch):
+    """Runs the test from the repository root, where the app finds the question CSVs."""
+    monkeypatch.chdir(ROOT)
+    return ROOT
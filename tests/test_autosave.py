@@ -0,0 +1,39 @@
+"""Autosaves keep a session restorable when its saved document has gone missing."""
+from streamlit.testing.v1 import AppTest
+
+from benchmarks import stand_ins
+from storage import SQLiteBackend, DEFAULT_SQLITE_PATH
+
+
+def click(at, label):
+    next(b for b in at.button if b.label == label).click().run()
+    assert not at.exception, at.exception
+
+
+def answer_and_autosave(at):
+    at.radio[-1].set_value(at.radio[-1].options[0])
+    click(at, "Submit Answer")
+    click(at, "Next Question")
+
+
+def test_autosave_recreates_deleted_session(in_repo):
+    stand_ins.install_local_storage()
+    at = AppTest.from_file('../quiz_webapp.py', default_timeout=30)
+    at.run()
+    at.radio[0].set_value("MRPL Study Case")
+    click(at, "Select Subject")
+    at.number_input[0].set_value(4)
+    click(at, "Start Quiz")
+    answer_and_autosave(at)
+    code = at.session_state.session_id
+
+    storage = SQLiteBackend(DEFAULT_SQLITE_PATH)
+    storage._db.execute("DELETE FROM documents WHERE collection = 'quiz_sessions' AND doc_id = ?", (code,))
+    answer_and_autosave(at)
+
+    resumed = AppTest.from_file('../quiz_webapp.py', default_timeout=30)
+    resumed.run()
+    resumed.text_input[1].set_value(code)
+    click(resumed, "Load Quiz")
+    assert resumed.session_state.current_question_index == 2
+    assert len(resumed.session_state.answer_history) == 2
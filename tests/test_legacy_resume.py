@@ -0,0 +1,74 @@
+"""A session saved before the save format was versioned can be resumed, autosaved and resumed again."""
+import csv
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks import stand_ins
+from storage import SQLiteBackend, DEFAULT_SQLITE_PATH
+
+SUBJECT = "MRPL Study Case"
+CSV_PATH = "multichoice-uts-mrpl-studycase.csv"
+
+
+def legacy_questions(count):
+    """Questions laid out like the first version of the app kept them in session state."""
+    with open(CSV_PATH, encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))[:count]
+    return [{'question': row['Pertanyaan'],
+             'options': [opt.strip() for opt in row['Pilihan Ganda'].split('\n')],
+             'answer': row['Jawaban'].lower().strip()} for row in rows]
+
+
+def legacy_document(code, questions):
+    history = [{'question_data': q, 'user_choice': q['options'][0],
+                'is_correct': q['options'][0].lower().startswith(q['answer'])} for q in questions[:2]]
+    return {
+        'session_id': code, 'selected_subject': SUBJECT, 'questions': questions,
+        'current_question_index': 2, 'score': sum(entry['is_correct'] for entry in history),
+        'auto_next': False, 'answer_submitted': False, 'last_choice': None, 'scored': False,
+        'timer_enabled': False, 'show_timer': False, 'time_elapsed_before_pause': 0,
+        'language': 'id', 'previous_language': 'id', 'answer_history': history,
+    }
+
+
+def resume(code):
+    at = AppTest.from_file('../quiz_webapp.py', default_timeout=30)
+    at.run()
+    at.text_input[1].set_value(code)
+    next(b for b in at.button if b.label == "Load Quiz").click().run()
+    assert not at.exception, at.exception
+    return at
+
+
+def answer_and_autosave(at):
+    at.radio[-1].set_value(at.radio[-1].options[0])
+    next(b for b in at.button if b.label == "Submit Answer").click().run()
+    next(b for b in at.button if b.label == "Next Question").click().run()
+    assert not at.exception, at.exception
+
+
+def resume_autosave_resume(code, questions):
+    SQLiteBackend(DEFAULT_SQLITE_PATH).set('quiz_sessions', code, legacy_document(code, questions))
+    stand_ins.install_local_storage()
+    answer_and_autosave(resume(code))
+    at = resume(code)
+    assert at.session_state.current_question_index == 3
+    assert len(at.session_state.answer_history) == 3
+    assert [q['question'] for q in at.session_state.original_questions] == [q['question'] for q in questions]
+    return at
+
+
+def test_legacy_session_survives_autosave(in_repo):
+    at = resume_autosave_resume('LEGACY-1', legacy_questions(4))
+    # The questions were found in the bank, so the save holds their IDs
+    ids = at.session_state.question_ids
+    assert [q['id'] for q in at.session_state.original_questions] == ids
+    assert [record.question_id for record in at.session_state.answer_history] == ids[:3]
+
+
+def test_legacy_session_with_unknown_questions_survives_autosave(in_repo):
+    questions = legacy_questions(4)
+    questions[1] = {**questions[1], 'question': "A question since removed from the bank"}
+    at = resume_autosave_resume('LEGACY-2', questions)
+    assert 'question_ids' not in at.session_state
+    assert at.session_state.original_questions[1]['options'][0][0] == 'a'
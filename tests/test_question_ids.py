@@ -0,0 +1,41 @@
+"""Question IDs stay stable when a question CSV is edited."""
+import csv
+import os
+
+import pytest
+
+from bank_ingest import ingest_bank
+from question_bank import CSV_QUESTION_COL, QuestionBank, compile_bank
+
+SOURCE_CSV = "multichoice-uts-pastra.csv"
+
+
+def write_rows(path, fieldnames, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@pytest.mark.parametrize('compile_', [
+    lambda csv_path, bank_path, previous: compile_bank(csv_path, bank_path, previous),
+    lambda csv_path, bank_path, previous: ingest_bank(csv_path, bank_path, previous, workers=1, chunk_bytes=4096),
+], ids=['build_bank', 'ingest_bank'])
+def test_edited_row_keeps_its_id_after_an_insert(in_repo, tmp_path, compile_):
+    with open(SOURCE_CSV, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        fieldnames, rows = reader.fieldnames, list(reader)[:20]
+    csv_path = os.path.join(tmp_path, 'bank.csv')
+    write_rows(csv_path, fieldnames, rows)
+    previous = QuestionBank(compile_bank(csv_path, os.path.join(tmp_path, 'previous.qbank')))
+    previous_ids = [question['id'] for question in previous]
+
+    # One change inserts a question near the top and fixes a typo further down
+    rows.insert(2, {**rows[0], CSV_QUESTION_COL: "A brand new question?"})
+    rows[11] = {**rows[11], CSV_QUESTION_COL: rows[11][CSV_QUESTION_COL] + " (fixed)"}
+    write_rows(csv_path, fieldnames, rows)
+    compile_(csv_path, os.path.join(tmp_path, 'current.qbank'), previous)
+    ids = [question['id'] for question in QuestionBank(os.path.join(tmp_path, 'current.qbank'))]
+
+    assert ids[2] == previous.next_id
+    assert ids[:2] + ids[3:] == previous_ids
@@ -0,0 +1,51 @@
+"""Queued updates to a Firestore document that no longer exists."""
+from benchmarks.stand_ins import FakeFirestoreClient
+from write_behind import WriteBehindQueue
+
+
+def test_update_of_missing_document_sets_fallback():
+    client = FakeFirestoreClient()
+    queue = WriteBehindQueue(client, flush_interval=60)
+    queue.update('quiz_sessions', 'CODE', {'score': 2}, fallback=lambda: {'score': 1})
+    queue.update('quiz_sessions', 'CODE', {'score': 3}, fallback=lambda: {'score': 3, 'snapshot': b'.'})
+    queue.flush()
+    assert client.docs[('quiz_sessions', 'CODE')] == {'score': 3, 'snapshot': b'.'}
+    assert queue.stats()['dropped'] == 0
+
+
+def test_update_of_missing_document_without_fallback_is_not_retried():
+    client = FakeFirestoreClient()
+    queue = WriteBehindQueue(client, flush_interval=60)
+    queue.update('quiz_sessions', 'CODE', {'score': 2})
+    queue.flush()
+    stats = queue.stats()
+    assert (stats['failed_batches'], stats['dropped'], stats['depth']) == (1, 1, 0)
+    assert ('quiz_sessions', 'CODE') not in client.docs
+
+
+def test_failed_writes_are_retried_with_backoff_until_committed(monkeypatch):
+    from google.api_core.exceptions import ServiceUnavailable
+    import write_behind
+    from benchmarks.stand_ins import FakeBatch
+
+    monkeypatch.setattr(write_behind, 'RETRY_BASE_DELAY', 0.05)
+    commit = FakeBatch.commit
+    attempts = []
+
+    def failing_commit(batch):
+        attempts.append(batch)
+        if len(attempts) <= 3:
+            raise ServiceUnavailable("Firestore is down")
+        commit(batch)
+
+    monkeypatch.setattr(FakeBatch, 'commit', failing_commit)
+    client = FakeFirestoreClient()
+    queue = WriteBehindQueue(client, flush_interval=60)
+    queue.set('quiz_sessions', 'CODE', {'score': 1})
+    queue.flush(timeout=0.01)
+    assert queue.stats()['retrying'] == 1
+    queue.update('quiz_sessions', 'CODE', {'score': 2})
+    queue.flush(timeout=5)
+    assert client.docs[('quiz_sessions', 'CODE')] == {'score': 2}
+    assert len(attempts) == 4
+    assert queue.stats()['dropped'] == 0
@@ -0,0 +1,359 @@
+"""
+Supported languages, pre-translated question banks, translation batching and
+the background event loop that runs translation work.
+
+A sidecar bank holds the translation of one subject CSV into one language as
+JSON lines next to the CSV, e.g. multichoice-uts-mankeb.en.jsonl. Each line is
+{"id": <question id>, "source": <fingerprint>, "question": ..., "options": [...]},
+where options holds the translated option texts without their letters.
+The fingerprint of the original question is stored so that rows whose source
+text has since changed are ignored and translated live instead.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+# --- TRANSLATION CONSTANTS ---
+DEFAULT_LANGUAGE = "id"  # Indonesian as default (source language)
+
+AVAILABLE_LANGUAGES = {
+    "id": "🇮🇩 Bahasa Indonesia (Original)",
+    "en": "🇬🇧 English",
+    "es": "🇪🇸 Español",
+    "fr": "🇫🇷 Français",
+    "de": "🇩🇪 Deutsch",
+    "zh-cn": "🇨🇳 简体中文",
+    "ja": "🇯🇵 日本語",
+    "ko": "🇰🇷 한국어",
+    "ar": "🇸🇦 العربية",
+    "pt": "🇵🇹 Português",
+}
+
+
+def source_fingerprint(question):
+    """Returns a short hash of a question's original text and option texts."""
+    source = '\n'.join([question['question'], *(text for _, text in question['options'])])
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+
+
+def sidecar_path_for(csv_path, lang):
+    """Returns the path of the sidecar bank for a subject CSV and language."""
+    return f"{os.path.splitext(csv_path)[0]}.{lang}.jsonl"
+
+
+def read_sidecar(path):
+    """Reads a sidecar bank into {question id: row}; a truncated last line is skipped."""
+    rows = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                rows[row['id']] = row
+    except FileNotFoundError:
+        pass
+    return rows
+
+
+def append_sidecar_rows(path, rows):
+    """Appends translated rows to a sidecar bank and flushes them to disk."""
+    with open(path, 'a', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# Parsed sidecars by path, with the mtime they were read at
+_sidecars = {}
+
+
+def load_sidecar(csv_path, lang):
+    """Returns the pre-translated rows for a subject and language, re-reading the file if it changed."""
+    path = sidecar_path_for(csv_path, lang)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    cached = _sidecars.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, read_sidecar(path))
+        _sidecars[path] = cached
+    return cached[1]
+
+
+def apply_sidecar(questions, sidecar):
+    """
+    Splits questions into (translated, missing): translated has the sidecar text
+    where an up-to-date row exists and None elsewhere; missing lists the
+    original questions that still need a live translation.
+    """
+    translated = []
+    missing = []
+    for q in questions:
+        row = sidecar.get(q.get('id'))
+        if row is not None and row.get('source') == source_fingerprint(q) \
+                and len(row['options']) == len(q['options']):
+            translated.append({
+                'id': q['id'],
+                'question': row['question'],
+                'options': [(letter, text) for (letter, _), text in zip(q['options'], row['options'])],
+                'answer_index': q['answer_index']
+            })
+        else:
+            translated.append(None)
+            missing.append(q)
+    return translated, missing
+
+
+def question_texts(questions):
+    """
+    Flattens questions into the list of texts to translate: each question
+    followed by its option texts (option letters are never translated).
+    """
+    texts = []
+    for q in questions:
+        texts.append(q['question'])
+        texts.extend(text for _, text in q['options'])
+    return texts
+
+
+def rebuild_questions(questions, translated_texts):
+    """Inverse of question_texts: builds translated question dicts, keeping each id, letter and answer."""
+    translated_questions = []
+    idx = 0
+    for q in questions:
+        num_options = len(q['options'])
+        option_texts = translated_texts[idx+1:idx+1+num_options]
+        translated_questions.append({
+            'id': q.get('id'),
+            'question': translated_texts[idx],
+            'options': [(letter, text) for (letter, _), text in zip(q['options'], option_texts)],
+            'answer_index': q['answer_index']
+        })
+        idx += 1 + num_options
+    return translated_questions
+
+
+class PrefetchJob:
+    """
+    Translates questions of one quiz in the background, in the given order and
+    in chunks, publishing each finished chunk so the UI can pick it up on its
+    next rerun. `translate_texts` is a blocking callable (texts) -> list with
+    None for texts that failed; questions with a failed text are left out.
+    """
+
+    def __init__(self, translate_texts, lang, indexed_questions, first_chunk=3, chunk_size=10):
+        self.lang = lang
+        self._translate_texts = translate_texts
+        self._pending = list(indexed_questions)
+        self._first_chunk = first_chunk
+        self._chunk_size = chunk_size
+        self._results = {}
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self.done = False
+
+    def run(self):
+        try:
+            size = self._first_chunk
+            while self._pending and not self._cancelled:
+                chunk, self._pending = self._pending[:size], self._pending[size:]
+                size = self._chunk_size
+                questions = [q for _, q in chunk]
+                translated_texts = self._translate_texts(question_texts(questions))
+                for (index, q), translated in zip(chunk, rebuild_questions(questions, translated_texts)):
+                    if translated['question'] is not None and \
+                            all(text is not None for _, text in translated['options']):
+                        with self._lock:
+                            self._results[index] = translated
+        finally:
+            self.done = True
+
+    def cancel(self):
+        """Stops the job after the chunk in progress."""
+        self._cancelled = True
+
+    def take_results(self):
+        """Returns {question index: translated question} finished since the last call."""
+        with self._lock:
+            results, self._results = self._results, {}
+        return results
+
+
+# --- Translation batching ---
+class TranslationStats:
+    """Thread-safe counters and latency samples for a TranslationScheduler."""
+
+    def __init__(self, max_samples=2000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=max_samples)
+        self.texts = 0          # texts requested
+        self.unique = 0         # distinct texts after deduplication
+        self.calls = 0          # translation calls made, including retries
+        self.failures = 0       # calls that raised
+        self.gave_up = 0        # texts that failed every attempt
+        self.translated = 0     # texts translated successfully
+        self.busy_seconds = 0.0
+
+    def record_call(self, seconds, ok):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self.translated += 1
+                self._latencies.append(seconds)
+            else:
+                self.failures += 1
+
+    def record_batch(self, texts, unique, gave_up, seconds):
+        with self._lock:
+            self.texts += texts
+            self.unique += unique
+            self.gave_up += gave_up
+            self.busy_seconds += seconds
+
+    def snapshot(self):
+        """Returns the counters plus throughput (texts/s) and p50/p95 call latency (ms)."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            data = {
+                'texts': self.texts, 'unique': self.unique, 'calls': self.calls,
+                'failures': self.failures, 'gave_up': self.gave_up, 'translated': self.translated,
+                'throughput': self.translated / self.busy_seconds if self.busy_seconds else 0.0,
+            }
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+        data['p50_ms'] = percentile(0.50)
+        data['p95_ms'] = percentile(0.95)
+        return data
+
+    def summary(self):
+        s = self.snapshot()
+        return (f"{s['translated']} translated from {s['texts']} texts ({s['unique']} unique), "
+                f"{s['calls']} calls, {s['failures']} failed calls, {s['gave_up']} gave up; "
+                f"{s['throughput']:.1f} texts/s, p50 {s['p50_ms']:.0f} ms, p95 {s['p95_ms']:.0f} ms")
+
+
+class TranslationScheduler:
+    """
+    Runs translation calls with a concurrency limit, translating each distinct
+    text only once per batch and retrying failed texts individually with
+    exponential backoff.
+
+    `translate` is an async callable (text, src_lang, dest_lang) -> str that
+    raises on failure. The concurrency limit applies per event loop.
+    """
+
+    def __init__(self, translate, max_concurrency=8, max_retries=3, backoff=0.5):
+        self._translate = translate
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = TranslationStats()
+        self._loop_state = {}
+        self._lock = threading.Lock()
+
+    def _state(self):
+        """Returns the semaphore and in-flight table for the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loop_state.get(loop)
+            if state is None:
+                # Forget loops that have been closed (e.g. by asyncio.run)
+                for old in [l for l in self._loop_state if l.is_closed()]:
+                    del self._loop_state[old]
+                state = (asyncio.Semaphore(self.max_concurrency), {})
+                self._loop_state[loop] = state
+            return state
+
+    async def _translate_with_retries(self, semaphore, text, src_lang, dest_lang):
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await self._translate(text, src_lang, dest_lang)
+                except Exception:
+                    self.stats.record_call(time.perf_counter() - started, ok=False)
+                else:
+                    self.stats.record_call(time.perf_counter() - started, ok=True)
+                    return result
+            if attempt < self.max_retries:
+                # Back off outside the semaphore so other texts keep going
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+        return None
+
+    async def translate_one(self, text, src_lang, dest_lang):
+        """Translates one text, sharing the call with an identical one already in flight."""
+        semaphore, in_flight = self._state()
+        key = (text, src_lang, dest_lang)
+        task = in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._translate_with_retries(semaphore, text, src_lang, dest_lang))
+            in_flight[key] = task
+            task.add_done_callback(lambda _: in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def translate_many(self, texts, src_lang, dest_lang):
+        """Translates texts, returning None in place of any text that failed every attempt."""
+        started = time.perf_counter()
+        unique = list(dict.fromkeys(texts))
+        results = await asyncio.gather(*(self.translate_one(text, src_lang, dest_lang) for text in unique))
+        by_text = dict(zip(unique, results))
+        gave_up = sum(1 for result in results if result is None)
+        self.stats.record_batch(len(texts), len(unique), gave_up, time.perf_counter() - started)
+        return [by_text[text] for text in texts]
+
+
+class BackgroundLoop:
+    """
+    A long-lived asyncio event loop on a daemon thread, shared by every session.
+    Coroutines are submitted from any thread and awaited through
+    concurrent.futures.Future objects.
+    """
+
+    def __init__(self, name="background-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+        self._lock = threading.Lock()
+        self._shared = {}
+        self.submitted = 0
+        self.coalesced = 0
+
+    def submit(self, coro):
+        """Schedules a coroutine on the loop and returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def submit_shared(self, key, make_coro):
+        """
+        Like submit, but while a job for `key` is still running, callers get that
+        job's future instead of starting another; make_coro is only called for new jobs.
+        """
+        with self._lock:
+            future = self._shared.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self.submit(make_coro())
+            self.submitted += 1
+            self._shared[key] = future
+
+        def forget(done):
+            with self._lock:
+                if self._shared.get(key) is done:
+                    del self._shared[key]
+        future.add_done_callback(forget)
+        return future
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
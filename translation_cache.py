@@ -0,0 +1,108 @@
+"""
+Server-wide translation cache.
+
+Translations are keyed by (SHA-256 of the source text, target language) and kept
+in two tiers: an in-memory LRU bounded by the size of the cached text, and an
+SQLite file that survives restarts and is shared by every worker process.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DEFAULT_DB_PATH = os.environ.get('QUIZ_TRANSLATION_CACHE', 'translations.sqlite3')
+DEFAULT_MEMORY_BYTES = 32 * 1024 * 1024
+
+# Rough per-entry bookkeeping cost on top of the translated text itself
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def text_hash(text):
+    """Returns the cache key for a source text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    """Two-tier (memory LRU + SQLite) store of translated texts, safe to share between threads."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_memory_bytes=DEFAULT_MEMORY_BYTES):
+        self.max_memory_bytes = max_memory_bytes
+        self.memory_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = self._open_db(db_path) if db_path else None
+
+    @staticmethod
+    def _open_db(db_path):
+        try:
+            db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " text_hash TEXT NOT NULL, lang TEXT NOT NULL, translated TEXT NOT NULL,"
+                " PRIMARY KEY (text_hash, lang)) WITHOUT ROWID"
+            )
+            return db
+        except sqlite3.Error:
+            # Unwritable location: keep working with the memory tier only
+            return None
+
+    # --- Memory tier (callers hold self._lock) ---
+    def _remember(self, key, translated):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.memory_bytes -= len(old) + ENTRY_OVERHEAD_BYTES
+        self._entries[key] = translated
+        self.memory_bytes += len(translated) + ENTRY_OVERHEAD_BYTES
+        while self.memory_bytes > self.max_memory_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.memory_bytes -= len(evicted) + ENTRY_OVERHEAD_BYTES
+
+    def get(self, text, lang):
+        """Returns the cached translation of text into lang, or None."""
+        key = (text_hash(text), lang)
+        with self._lock:
+            translated = self._entries.get(key)
+            if translated is not None:
+                self._entries.move_to_end(key)
+                return translated
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT translated FROM translations WHERE text_hash = ? AND lang = ?", key
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+            if row is None:
+                return None
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, text, lang, translated):
+        """Stores a translation in both tiers."""
+        self.put_many(lang, [(text, translated)])
+
+    def put_many(self, lang, pairs):
+        """Stores (text, translated) pairs for one target language in a single transaction."""
+        rows = [(text_hash(text), lang, translated) for text, translated in pairs]
+        with self._lock:
+            for key_hash, _, translated in rows:
+                self._remember((key_hash, lang), translated)
+            if self._db is None or not rows:
+                return
+            try:
+                with self._db:
+                    self._db.execute("BEGIN")
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO translations (text_hash, lang, translated) VALUES (?, ?, ?)",
+                        rows
+                    )
+            except sqlite3.Error:
+                pass
+
+    def __len__(self):
+        """Number of entries in the memory tier."""
+        return len(self._entries)
@@ -0,0 +1,259 @@
+"""
+Write-behind queue for Firestore.
+
+Writes are accepted immediately and committed by a background thread in
+Firestore batch writes, either every `flush_interval` seconds or as soon as a
+full batch is waiting, and once more when the process exits. Pending writes to
+the same document are coalesced, so a student who autosaves several times
+between flushes costs a single write.
+
+A write that fails is kept, merged with any later write to its document, and
+retried after a delay that doubles with every failure (up to RETRY_MAX_DELAY),
+so an outage neither drops autosaves nor floods Firestore with retries. Writes
+still failing when the process exits are dropped and counted in stats().
+"""
+import atexit
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Firestore accepts at most 500 writes per batch
+MAX_BATCH_SIZE = 500
+# Seconds before the first retry of a failed write, and the most it waits between retries
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 60.0
+
+
+def apply_update(document, fields):
+    """Applies update() field paths like 'history.q3' to a plain document dict."""
+    for field, value in fields.items():
+        *parents, name = field.split('.')
+        target = document
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[name] = value
+    return document
+
+
+class PendingWrite:
+    """A set() or update() waiting to be committed for one document."""
+
+    def __init__(self, ref, kind, data, fallback=None):
+        self.ref = ref
+        self.kind = kind
+        self.data = data
+        self.fallback = fallback
+        self.attempts = 0
+        self.retry_at = 0.0  # time.monotonic() before which a failed write is not retried
+
+    def merge(self, newer):
+        """Folds a later write to the same document into this one."""
+        if newer.kind == 'set':
+            self.kind, self.data, self.fallback = 'set', newer.data, None
+        elif self.kind == 'set':
+            apply_update(self.data, newer.data)
+        else:
+            self.data.update(newer.data)
+            self.fallback = newer.fallback or self.fallback
+
+
+class WriteBehindQueue:
+    """Background batching writer in front of a Firestore client."""
+
+    def __init__(self, db, flush_interval=2.0, batch_size=MAX_BATCH_SIZE):
+        self._db = db
+        self.flush_interval = flush_interval
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Condition(self._lock)
+        self._flushing = False
+        self._closed = False
+
+        # Counters for stats()
+        self._latencies = deque(maxlen=200)
+        self.accepted = 0
+        self.coalesced = 0
+        self.committed = 0
+        self.failed_batches = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name="firestore-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- Producers ---
+    def _enqueue(self, write):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            key = write.ref.path
+            self.accepted += 1
+            if key in self._pending:
+                self._pending[key].merge(write)
+                self.coalesced += 1
+            else:
+                self._pending[key] = write
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+
+    def set(self, collection, doc_id, data):
+        """Queues doc_ref.set(data); doc_id None picks a new random document ID."""
+        ref = self._db.collection(collection).document(doc_id)
+        self._enqueue(PendingWrite(ref, 'set', dict(data)))
+
+    def update(self, collection, doc_id, fields, fallback=None):
+        """
+        Queues doc_ref.update(fields) for an existing document. If it turns out
+        not to exist, fallback() is called for the full document to set instead;
+        without a fallback the update is dropped.
+        """
+        ref = self._db.collection(collection).document(doc_id)
+        self._enqueue(PendingWrite(ref, 'update', dict(fields), fallback))
+
+    # --- Flushing ---
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._lock:
+                closed = self._closed
+                while closed and self._flushing:
+                    self._idle.wait()
+            # On exit, retry failed writes one last time without waiting out their delay
+            self._flush_once(retry_all=closed)
+            if closed:
+                with self._lock:
+                    for key in self._pending:
+                        self.dropped += 1
+                        print(f"write-behind: dropping write to {key} at exit", file=sys.stderr)
+                    self._pending.clear()
+                return
+
+    def _flush_once(self, retry_all=False):
+        with self._lock:
+            if self._flushing:
+                return
+            now = time.monotonic()
+            writes = [write for write in self._pending.values() if retry_all or write.retry_at <= now]
+            if not writes:
+                return
+            self._flushing = True
+            for write in writes:
+                del self._pending[write.ref.path]
+        try:
+            for start in range(0, len(writes), self.batch_size):
+                self._commit(writes[start:start + self.batch_size])
+        finally:
+            with self._lock:
+                self._flushing = False
+                self._idle.notify_all()
+
+    def _commit(self, writes):
+        batch = self._db.batch()
+        for write in writes:
+            if write.kind == 'set':
+                batch.set(write.ref, write.data)
+            else:
+                batch.update(write.ref, write.data)
+        started = time.perf_counter()
+        try:
+            batch.commit()
+        except Exception as e:
+            from google.api_core.exceptions import NotFound
+            with self._lock:
+                self.failed_batches += 1
+            if len(writes) > 1:
+                # Batches are all-or-nothing; retry one by one so a bad write only holds back itself
+                for write in writes:
+                    self._commit([write])
+            elif isinstance(e, NotFound):
+                # The document to update is gone, which retrying won't fix
+                self._replace_missing(writes[0], e)
+            else:
+                with self._lock:
+                    self._requeue(writes, e)
+            return
+        with self._lock:
+            self._latencies.append(time.perf_counter() - started)
+            self.committed += len(writes)
+
+    def _replace_missing(self, write, error):
+        """Sets the full document of an update whose document does not exist, or drops the update."""
+        if write.fallback is None:
+            with self._lock:
+                self.dropped += 1
+            print(f"write-behind: dropping update to missing {write.ref.path}: {error}", file=sys.stderr)
+            return
+        write.kind, write.data, write.fallback = 'set', write.fallback(), None
+        self._commit([write])
+
+    def _requeue(self, writes, error):
+        """Puts failed writes back in front of anything queued since, to retry after a delay (callers hold the lock)."""
+        retry = OrderedDict()
+        for write in writes:
+            write.attempts += 1
+            write.retry_at = time.monotonic() + min(RETRY_BASE_DELAY * 2 ** (write.attempts - 1), RETRY_MAX_DELAY)
+            if write.attempts == 1:
+                print(f"write-behind: write to {write.ref.path} failed, retrying: {error}", file=sys.stderr)
+            retry[write.ref.path] = write
+        for key, newer in self._pending.items():
+            if key in retry:
+                retry[key].merge(newer)
+            else:
+                retry[key] = newer
+        self._pending = retry
+
+    def flush(self, timeout=None):
+        """
+        Commits everything queued so far and waits for it (or until timeout
+        seconds pass), including writes queued while the background thread was
+        flushing. Failed writes are retried when their backoff delay is up, so
+        during an outage this waits for the timeout (or for good, without one).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self._flush_once()
+            with self._lock:
+                while self._flushing:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return
+                    self._idle.wait(remaining)
+                if not self._pending:
+                    return
+                # Sleep until the next retry is due, or a flush by the background thread ends
+                wait = min(write.retry_at for write in self._pending.values()) - time.monotonic()
+                if deadline is not None:
+                    if deadline <= time.monotonic():
+                        return
+                    wait = min(wait, deadline - time.monotonic())
+                if wait > 0:
+                    self._idle.wait(wait)
+
+    def close(self):
+        """Flushes remaining writes and stops the background thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=30)
+
+    def stats(self):
+        """Returns queue depth, write counters and flush latency (ms)."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'depth': len(self._pending),
+                'retrying': sum(1 for write in self._pending.values() if write.attempts),
+                'accepted': self.accepted,
+                'coalesced': self.coalesced,
+                'committed': self.committed,
+                'failed_batches': self.failed_batches,
+                'dropped': self.dropped,
+                'last_flush_ms': self._latencies[-1] * 1000 if self._latencies else 0.0,
+                'p95_flush_ms': latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else 0.0,
+            }